@@ -0,0 +1,103 @@
+# backfill.py
+#
+# Переобработка архивов FIRMS (zip/CSV) за произвольный период: файлы читаются частями
+# прямо из zip, части сопоставляются с полигонами в пуле процессов, совпадения пишутся
+# в историю (core/history.py). В памяти одновременно не больше 2 × workers частей.
+#
+# Пример:  python backfill.py data/firms_2024/ --workers 4
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+import pandas as pd
+
+from core.detection_filter import filter_detections
+from core.geo_downloader import list_archive_entries, read_archive_entry, _to_gdf
+from core.geo_processor import get_polygon_index, load_polygon_index, find_matches_with_tolerance
+from core.history import append_run
+
+logger = logging.getLogger("backfill")
+
+DEFAULT_CHUNKSIZE = 200_000
+
+
+def _init_worker():
+    logging.getLogger("core").setLevel(logging.WARNING)
+    get_polygon_index()
+
+
+def match_chunk(source: str, chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Выполняется в рабочем процессе: полигоны загружены из кэша один раз на процесс.
+    """
+    # Тот же фильтр качества, что и в ночном пайплайне: история не смешивает
+    # отфильтрованные и нефильтрованные совпадения
+    fire_gdf, _ = filter_detections(_to_gdf(chunk, source))
+    if fire_gdf.empty:
+        return pd.DataFrame()
+    matched = find_matches_with_tolerance(fire_gdf, get_polygon_index())
+    if matched.empty:
+        return pd.DataFrame()
+    # Геометрия не нужна истории и дорого передаётся между процессами
+    return pd.DataFrame(matched.drop(columns="geometry"))
+
+
+def backfill(paths, workers: int, chunksize: int) -> int:
+    entries = list_archive_entries(paths)
+    if not entries:
+        logger.error("[BACKFILL] Не найдено ни одного архива FIRMS")
+        return 0
+
+    # Кэш полигонов собирается заранее, чтобы рабочие процессы только читали его
+    if load_polygon_index() is None:
+        logger.error("[BACKFILL] Полигоны не загружены")
+        return 0
+
+    run_stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    total_rows = total_matches = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for n, (source, path, member) in enumerate(entries):
+            label = f"{path}:{member}" if member else str(path)
+            started = time.perf_counter()
+            in_flight, results, rows = set(), [], 0
+
+            for chunk in read_archive_entry(path, member, chunksize=chunksize):
+                rows += len(chunk)
+                in_flight.add(pool.submit(match_chunk, source, chunk))
+                # Ограничиваем число частей в очереди — память не растёт с размером файла
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    results.extend(f.result() for f in done)
+
+            results.extend(f.result() for f in in_flight)
+            results = [r for r in results if not r.empty]
+            matched = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+            if not matched.empty:
+                append_run(matched, [], run_id=f"backfill-{run_stamp}-{n}")
+
+            total_rows += rows
+            total_matches += len(matched)
+            logger.info(f"[BACKFILL] {source} {label}: {rows} точек, {len(matched)} совпадений "
+                        f"за {time.perf_counter() - started:.1f} с")
+
+    logger.info(f"[BACKFILL] ✅ Итого: {len(entries)} файлов, {total_rows} точек, {total_matches} совпадений")
+    return total_matches
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Переобработка архивов FIRMS в историю")
+    parser.add_argument("paths", nargs="+", help="Архивы FIRMS (zip/CSV) или каталоги с ними")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Число рабочих процессов")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Строк CSV в одной части")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = parse_args()
+    backfill(args.paths, args.workers, args.chunksize)
@@ -0,0 +1,86 @@
+# benchmarks/bench_ingest.py
+#
+# Время и память загрузки CSV FIRMS: прежний путь (вывод типов + shapely.Point в цикле)
+# против типизированного read_firms_csv + gpd.points_from_xy.
+#
+# Запуск из корня проекта:  python -m benchmarks.bench_ingest
+
+import argparse
+import io
+import time
+import tracemalloc
+import zipfile
+
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import Point
+
+from core.geo_downloader import read_firms_csv, _to_gdf, concat_frames
+from benchmarks.bench_matching import ARCHIVE_DIR, ARCHIVES
+
+
+def read_archive_bytes():
+    contents = {}
+    for source, name in ARCHIVES.items():
+        with zipfile.ZipFile(ARCHIVE_DIR / name) as zf:
+            member = next(n for n in zf.namelist() if n.endswith(".csv"))
+            contents[source] = zf.read(member)
+    return contents
+
+
+def legacy_ingest(contents):
+    frames = []
+    for source, content in contents.items():
+        df = pd.read_csv(io.BytesIO(content))
+        geometry = [Point(xy) for xy in zip(df['longitude'], df['latitude'])]
+        gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+        gdf["source"] = source
+        frames.append(gdf)
+    return pd.concat(frames, ignore_index=True)
+
+
+def typed_ingest(contents):
+    frames = [_to_gdf(read_firms_csv(io.BytesIO(content)), source) for source, content in contents.items()]
+    return concat_frames(frames)
+
+
+def measure(func, contents, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(contents)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    result = func(contents)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frame_bytes = pd.DataFrame(result.drop(columns="geometry")).memory_usage(deep=True).sum()
+    return min(timings), peak, frame_bytes, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки CSV FIRMS")
+    parser.add_argument("--repeat", type=int, default=3, help="Число повторов (берётся лучшее время)")
+    args = parser.parse_args()
+
+    contents = read_archive_bytes()
+    size_mb = sum(len(c) for c in contents.values()) / 2**20
+    print(f"📦 {len(contents)} CSV, {size_mb:.1f} МБ")
+
+    rows = {}
+    for label, func in (("pd.read_csv + Point", legacy_ingest), ("read_firms_csv + points_from_xy", typed_ingest)):
+        rows[label] = measure(func, contents, args.repeat)
+
+    print(f"\n{'вариант':<34}{'время, с':>10}{'пик, МБ':>10}{'таблица, МБ':>14}{'строк':>10}")
+    for label, (elapsed, peak, frame_bytes, count) in rows.items():
+        print(f"{label:<34}{elapsed:>10.3f}{peak / 2**20:>10.1f}{frame_bytes / 2**20:>14.1f}{count:>10}")
+
+    (old_t, old_peak, old_frame, _), (new_t, new_peak, new_frame, _) = rows.values()
+    print(f"\n⚡ Время: x{old_t / new_t:.1f}, пик памяти: x{old_peak / new_peak:.1f}, "
+          f"таблица без геометрии: x{old_frame / new_frame:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_matching.py
+#
+# Сравнение старого поиска совпадений (буфер + sjoin) с индексом PolygonIndex
+# на архивных апрельских данных FIRMS из data/firms_april.
+#
+# Запуск из корня проекта:  python -m benchmarks.bench_matching
+
+import argparse
+import time
+import zipfile
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from core.geo_processor import (
+    load_polygons, build_polygon_index, find_matches_with_tolerance, get_tolerance,
+)
+
+ARCHIVE_DIR = Path("data/firms_april")
+ARCHIVES = {
+    "modis_archive": "DL_FIRE_M-C61_638549.zip",
+    "viirs_suomi_archive": "DL_FIRE_SV-C2_638552.zip",
+    "viirs_noaa20_archive": "DL_FIRE_J1V-C2_638550.zip",
+    "viirs_noaa21_archive": "DL_FIRE_J2V-C2_638551.zip",
+}
+
+
+def load_april_archives():
+    frames = []
+    for source, name in ARCHIVES.items():
+        with zipfile.ZipFile(ARCHIVE_DIR / name) as zf:
+            member = next(n for n in zf.namelist() if n.endswith(".csv"))
+            with zf.open(member) as f:
+                df = pd.read_csv(f)
+        df["source"] = source
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["longitude"], df["latitude"]), crs="EPSG:4326")
+
+
+def legacy_find_matches(fire_points_gdf, polygon_gdf):
+    """
+    Прежняя реализация: буфер вокруг каждой точки и sjoin по всему фиду.
+    """
+    results = []
+    for source, group in fire_points_gdf.groupby("source"):
+        tolerance_m = get_tolerance(source)
+        group = group.to_crs(epsg=3857)
+        polygons_m = polygon_gdf.to_crs(epsg=3857)
+        group["geometry"] = group.geometry.buffer(tolerance_m)
+        matches = gpd.sjoin(group, polygons_m, how="inner", predicate="intersects")
+        results.append(matches.to_crs("EPSG:4326"))
+    return pd.concat(results, ignore_index=True)
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def match_keys(matches):
+    return set(zip(matches["source"], matches["latitude"], matches["longitude"],
+                   matches["acq_date"], matches["acq_time"], matches["unique_id"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска совпадений")
+    parser.add_argument("--repeat", type=int, default=5, help="Число повторов (берётся лучшее время)")
+    args = parser.parse_args()
+
+    fire_gdf = load_april_archives()
+    poly_gdf = load_polygons()
+    print(f"🔥 Точек: {len(fire_gdf)}, 🗺️ полигонов: {len(poly_gdf)}")
+
+    legacy_time, legacy = best_of(lambda: legacy_find_matches(fire_gdf, poly_gdf), args.repeat)
+    build_time, poly_index = best_of(lambda: build_polygon_index(poly_gdf), args.repeat)
+    index_time, matched = best_of(lambda: find_matches_with_tolerance(fire_gdf, poly_index), args.repeat)
+
+    print(f"\n{'вариант':<28}{'время, с':>12}{'совпадений':>12}")
+    print(f"{'buffer + sjoin':<28}{legacy_time:>12.3f}{len(legacy):>12}")
+    print(f"{'PolygonIndex (построение)':<28}{build_time:>12.3f}{'':>12}")
+    print(f"{'PolygonIndex (поиск)':<28}{index_time:>12.3f}{len(matched):>12}")
+    print(f"\n⚡ Ускорение поиска: x{legacy_time / index_time:.1f}")
+
+    # Буфер — многоугольник, а dwithin — точное расстояние, поэтому на границе допуска
+    # возможны единичные расхождения
+    legacy_keys, index_keys = match_keys(legacy), match_keys(matched)
+    print(f"Только в buffer + sjoin: {len(legacy_keys - index_keys)}, "
+          f"только в PolygonIndex: {len(index_keys - legacy_keys)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_startup.py
+#
+# Запуск бота: время импорта bot_main (обработчики, планировщик, сборка Application)
+# и RSS процесса сразу после него, плюс какие тяжёлые модули (GIS, pandas) загрузились.
+# Каждый замер — в отдельном чистом процессе; run_polling подменяется, сеть не нужна.
+#
+# Запуск из корня проекта:  python -m benchmarks.bench_startup --repeat 5
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["geopandas", "shapely", "pyproj", "pandas", "numpy", "pyarrow", "aiohttp", "requests"]
+
+# Выполняется в дочернем процессе
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from telegram.ext import Application
+Application.run_polling = lambda self, *args, **kwargs: None
+import bot_main
+elapsed = time.perf_counter() - started
+rss_kb = next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmRSS:"))
+print(json.dumps({"seconds": elapsed, "rss_kb": rss_kb, "modules": sorted(m for m in %r if m in sys.modules)}))
+"""
+
+
+def probe() -> dict:
+    env = {**os.environ, "TELEGRAM_TOKEN": os.getenv("TELEGRAM_TOKEN") or "1:benchmark"}
+    env.pop("SCHEDULER_ENABLED", None)
+    # setup_logger пишет в logs/bot.log
+    (ROOT / "logs").mkdir(exist_ok=True)
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % HEAVY_MODULES],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время запуска и память бота")
+    parser.add_argument("--repeat", type=int, default=5, help="Число запусков (берётся медиана)")
+    args = parser.parse_args()
+
+    # Первый запуск прогревает кэш файловой системы и .pyc — в замер не идёт
+    probe()
+    runs = [probe() for _ in range(args.repeat)]
+
+    seconds = statistics.median(run["seconds"] for run in runs)
+    rss_mb = statistics.median(run["rss_kb"] for run in runs) / 1024
+    print(f"Импорт bot_main: {seconds:.2f} с (медиана из {args.repeat}), RSS {rss_mb:.0f} МБ")
+    print(f"Загружены тяжёлые модули: {', '.join(runs[-1]['modules']) or 'нет'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_templates.py
+#
+# Стоимость рендера текстов алертов на 10 тыс. алертов: прежний путь (str.format(**alert)
+# с перехватом KeyError, без экранирования) против скомпилированного шаблона
+# utils/templates.py — по одному и пакетом render_many для всей рассылки.
+#
+# Запуск из корня проекта:  python -m benchmarks.bench_templates --alerts 10000
+
+import argparse
+import random
+import time
+
+from core.notifier import ALERT_TEMPLATE, format_alert_message, format_alert_messages
+
+SEED = 20250403
+
+
+def make_alerts(count: int) -> list[dict]:
+    rng = random.Random(SEED)
+    alerts = []
+    for i in range(count):
+        lat, lon = rng.uniform(53, 58), rng.uniform(31, 43)
+        unique_id = rng.randint(1, 9000)
+        alerts.append({
+            "id": f"{unique_id}-202504{i % 30 + 1:02d}0830", "unique_id": unique_id,
+            "name": "Смоленская область — ПОЧИНКОВСКИЙ", "count": rng.randint(1, 40),
+            "lat": round(lat, 5), "lon": round(lon, 5),
+            "wiki_url": f"https://wiki.simargl-team.ru/index.php/Торфяник_{unique_id}",
+            "region": "Смоленская область", "title": f"Торфяник <{unique_id}> & Co",
+            "map_url": f"https://yandex.ru/maps/?ll={lon},{lat}&z=13",
+            "date": "2025-04-03 09:30", "first_seen": "2025-04-03 08:41", "last_seen": "2025-04-03 09:30",
+            "frp_total": round(rng.uniform(1, 300), 2), "sources": {"viirs_noaa20": 1},
+        })
+    return alerts
+
+
+def legacy_format(alert: dict) -> str:
+    try:
+        return ALERT_TEMPLATE.text.format(**alert)
+    except KeyError as e:
+        return f"[Ошибка генерации уведомления для {alert.get('id')}: {e}]"
+
+
+def measure(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Стоимость рендера шаблонов алертов")
+    parser.add_argument("--alerts", type=int, default=10_000, help="Число алертов")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов (берётся лучший)")
+    args = parser.parse_args()
+
+    alerts = make_alerts(args.alerts)
+    variants = {
+        "str.format(**alert), без экранирования": lambda: [legacy_format(a) for a in alerts],
+        "Template.render по одному": lambda: [format_alert_message(a) for a in alerts],
+        "Template.render_many пакетом": lambda: format_alert_messages(alerts),
+    }
+    print(f"Алертов: {len(alerts)}")
+    for label, func in variants.items():
+        seconds = measure(func, args.repeat)
+        per_10k = seconds * 10_000 / len(alerts)
+        print(f"  {label:<42} {per_10k * 1000:8.1f} мс на 10 тыс.  ({seconds / len(alerts) * 1e6:.2f} мкс/алерт)")
+
+
+if __name__ == "__main__":
+    main()
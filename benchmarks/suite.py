@@ -0,0 +1,335 @@
+# benchmarks/suite.py
+#
+# Воспроизводимый набор бенчмарков всего пайплайна: загрузка CSV, фильтр качества, полигоны
+# (GeoJSON, сборка и чтение кэша), поиск совпадений, слияние детекций разных сенсоров,
+# формирование алертов и подготовка рассылки (форматирование + дедупликация по журналу
+# доставки) с поддельным ботом. Этапы и настройки (data/settings.json) — как в main._run_pipeline.
+#
+# Масштабы:  april — архивы data/firms_april и Final_CFO(9region).geojson как есть;
+#            large — синтетическое увеличение до 1 млн точек и 10 тыс. полигонов
+#            (копии полигонов со сдвигом и точки вокруг них, фиксированный seed).
+# Всё состояние (кэши, события, журнал доставки, подписки) живёт во временном каталоге,
+# данные проекта не меняются. Результат сохраняется в benchmarks/results/<commit>-<scale>.json.
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.suite --scale april
+#   python -m benchmarks.suite --scale large --baseline 1a2b3c4     # сравнить с коммитом
+#   python -m benchmarks.suite --compare results/a-april.json results/b-april.json
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+ARCHIVE_DIR = ROOT / "data" / "firms_april"
+POLYGON_FILE = ROOT / "data" / "Final_CFO(9region).geojson"
+SETTINGS_FILE = ROOT / "data" / "settings.json"
+
+# users — подписчики для этапов рассылки: на большом масштабе алертов в десятки раз больше,
+# и число сообщений (алерты × подписчики региона) держится в тех же пределах
+SCALES = {
+    "april": {"points": None, "polygons": None, "users": 1000},
+    "large": {"points": 1_000_000, "polygons": 10_000, "users": 100},
+}
+SEED = 20250401
+REGIONS_PER_USER = 2
+
+# Бот без сети — считаем только свою работу: тексты, журнал, очередь
+os.environ.setdefault("TELEGRAM_TOKEN", "0:benchmark")
+
+
+# === Окружение ===
+@contextmanager
+def isolated_workdir():
+    """
+    Временный рабочий каталог с data/: модули проекта пишут состояние по относительным путям.
+    """
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        (Path(tmp) / "data").mkdir()
+        (Path(tmp) / "logs").mkdir()
+        os.chdir(tmp)
+        try:
+            yield Path(tmp)
+        finally:
+            os.chdir(previous)
+
+
+def git_revision() -> str:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Timings:
+    """
+    Лучшее время из repeat повторов по каждому этапу; setup выполняется перед повтором вне замера.
+    """
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.stages = {}
+
+    def measure(self, name: str, func, setup=None):
+        timings, result = [], None
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        self.stages[name] = round(min(timings), 4)
+        print(f"  {name:<24}{self.stages[name]:>10.3f} с")
+        return result
+
+
+# === Синтетические данные ===
+def scale_polygons(poly_gdf, target: int, rng):
+    """
+    Копии полигонов со сдвигом на сетке; возвращает (полигоны, сдвиги копий в градусах).
+    """
+    import shapely
+
+    copies = math.ceil(target / len(poly_gdf))
+    side = math.ceil(math.sqrt(copies))
+    offsets = [(0.0, 0.0)] + [
+        (dx * 0.8 + rng.uniform(-0.1, 0.1), dy * 0.6 + rng.uniform(-0.1, 0.1))
+        for dx in range(-side // 2, side - side // 2)
+        for dy in range(-side // 2, side - side // 2)
+        if (dx, dy) != (0, 0)
+    ][:copies - 1]
+
+    frames = []
+    for k, (dx, dy) in enumerate(offsets):
+        part = poly_gdf.copy()
+        part["geometry"] = shapely.transform(part.geometry.values, lambda xy: xy + (dx, dy))
+        part["unique_id"] = part["unique_id"].astype("int64") + k * 100_000
+        frames.append(part)
+    polygons = pd.concat(frames, ignore_index=True).iloc[:target]
+    return polygons.set_crs("EPSG:4326", allow_override=True), np.array(offsets)
+
+
+def scale_points(fire_df, target: int, offsets, rng):
+    """
+    Точки апрельских архивов, перенесённые к случайной копии полигонов с небольшим шумом.
+    """
+    rows = rng.integers(0, len(fire_df), target)
+    copy = rng.integers(0, len(offsets), target)
+    df = fire_df.iloc[rows].reset_index(drop=True)
+    df["longitude"] = (df["longitude"] + offsets[copy, 0] + rng.normal(0, 0.01, target)).astype("float32")
+    df["latitude"] = (df["latitude"] + offsets[copy, 1] + rng.normal(0, 0.01, target)).astype("float32")
+    return df
+
+
+def prepare_inputs(scale: str, workdir: Path):
+    """
+    Кладёт в workdir/data входные файлы нужного масштаба; возвращает описание CSV для загрузки.
+    """
+    from core.geo_downloader import load_local_archives
+
+    spec = SCALES[scale]
+    # Пороги фильтра, погрешности и окно слияния — те же, что у рабочего пайплайна
+    if SETTINGS_FILE.exists():
+        os.symlink(SETTINGS_FILE, workdir / "data" / SETTINGS_FILE.name)
+    if spec["points"] is None:
+        os.symlink(ARCHIVE_DIR, workdir / "data" / "firms_april")
+        os.symlink(POLYGON_FILE, workdir / "data" / POLYGON_FILE.name)
+        return None
+
+    import geopandas as gpd
+
+    rng = np.random.default_rng(SEED)
+    # GeoJSON проекта хранит координаты в EPSG:3857 (см. load_polygons)
+    poly_gdf = gpd.read_file(POLYGON_FILE).set_crs("EPSG:3857", allow_override=True).to_crs("EPSG:4326")
+    polygons, offsets = scale_polygons(poly_gdf, spec["polygons"], rng)
+    polygons.to_crs("EPSG:3857").to_file(workdir / "data" / POLYGON_FILE.name, driver="GeoJSON")
+
+    os.symlink(ARCHIVE_DIR, workdir / "data" / "firms_april")
+    fire = pd.DataFrame(load_local_archives().drop(columns=["geometry", "downloaded_at"]))
+    fire["source"] = fire["source"].astype(str).str.replace("_archive", "", regex=False)
+    points = scale_points(fire, spec["points"], offsets, rng)
+    csv_paths = {}
+    for source, part in points.groupby("source", observed=True):
+        path = workdir / "data" / f"synthetic_{source}.csv"
+        part.drop(columns="source").to_csv(path, index=False)
+        csv_paths[source] = path
+    return csv_paths
+
+
+# === Этапы ===
+def run_suite(scale: str, repeat: int) -> dict:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    timings, counts = Timings(repeat), {}
+
+    with isolated_workdir() as workdir:
+        csv_paths = prepare_inputs(scale, workdir)
+
+        from core import geo_processor
+        from core.geo_downloader import load_local_archives, read_firms_csv, _to_gdf, concat_frames
+        from core.alert_generator import generate_alerts
+        from core.detection_filter import filter_detections
+        from core.sensor_dedup import collapse_cross_sensor
+        from utils.settings import get_settings
+
+        def ingest():
+            if csv_paths is None:
+                return load_local_archives()
+            return concat_frames([_to_gdf(read_firms_csv(path), source) for source, path in csv_paths.items()])
+
+        def drop_polygon_cache():
+            geo_processor.POLYGON_CACHE_PATH.unlink(missing_ok=True)
+            geo_processor.POLYGON_CACHE_META.unlink(missing_ok=True)
+
+        raw_gdf = timings.measure("ingest", ingest)
+        fire_gdf, _ = timings.measure("prefilter", lambda: filter_detections(raw_gdf))
+        poly_gdf = timings.measure("polygons.geojson", geo_processor.load_polygons)
+        timings.measure("polygons.cache_build", geo_processor.build_polygon_cache, setup=drop_polygon_cache)
+        index = timings.measure("polygons.cache_load", geo_processor.load_polygon_index)
+        index = geo_processor.enabled_polygons(index, get_settings())
+        matched = timings.measure("match", lambda: geo_processor.find_matches_with_tolerance(fire_gdf, index))
+        observations = timings.measure("dedup", lambda: collapse_cross_sensor(matched, by="unique_id"))
+        counts.update(points=len(raw_gdf), prefiltered=len(fire_gdf), polygons=len(poly_gdf),
+                      matches=len(matched), observations=len(observations))
+
+        # Вики — без сети: кэш заполнен ссылками на все торфяники
+        wiki_cache = {str(int(uid)): {"url": f"https://wiki.simargl-team.ru/index.php/Торфяник_{int(uid)}",
+                                      "checked_at": datetime.now().isoformat()}
+                      for uid in poly_gdf["unique_id"]}
+        Path("data/wiki_cache.json").write_text(json.dumps(wiki_cache, ensure_ascii=False))
+        alerts = timings.measure("alerts", lambda: generate_alerts(observations),
+                                 setup=lambda: Path("data/events.json").unlink(missing_ok=True))
+        counts["alerts"] = len(alerts)
+
+        regions = sorted(poly_gdf["region"].dropna().unique())
+        bench_notifier(timings, alerts, regions, SCALES[scale]["users"], counts)
+
+    return {"stages": timings.stages, "counts": counts}
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, **kwargs):
+        self.sent += 1
+
+
+def bench_notifier(timings: Timings, alerts, regions, user_count: int, counts: dict):
+    """
+    Рассылка с поддельным ботом и без лимитов Telegram: форматирование, журнал доставки,
+    дедупликация (повторная рассылка тех же алертов не должна ничего отправить).
+    """
+    rng = np.random.default_rng(SEED)
+    users = list(range(100_000, 100_000 + user_count))
+    user_regions = {str(uid): sorted(rng.choice(regions, REGIONS_PER_USER, replace=False).tolist())
+                    for uid in users}
+    Path("data/users.json").write_text(json.dumps(users))
+    Path("data/user_regions.json").write_text(json.dumps(user_regions, ensure_ascii=False))
+
+    import tg.notifier as notifier
+    from tg.delivery import DeliveryScheduler
+
+    class UnlimitedScheduler(DeliveryScheduler):
+        def __init__(self, bot, **send_kwargs):
+            super().__init__(bot, rate=1e9, burst=1e9, per_chat_interval=0, max_concurrent_chats=256,
+                             **send_kwargs)
+
+    notifier.DeliveryScheduler = UnlimitedScheduler
+    bot = FakeBot()
+
+    def reset_ledger():
+        for path in Path("data").glob("delivery.sqlite*"):
+            path.unlink()
+
+    def send(digest=False):
+        stats = asyncio.run(notifier.send_alert_messages(alerts, digest=digest, app_bot=bot))
+        return stats.sent if stats else 0
+
+    counts["users"] = user_count
+    counts["messages"] = timings.measure("notify.first", send, setup=reset_ledger)
+    counts["messages_after_dedup"] = timings.measure("notify.dedup", send)
+    counts["digest_messages"] = timings.measure("notify.digest", lambda: send(digest=True), setup=reset_ledger)
+
+
+# === Сравнение ===
+def load_result(ref: str, scale: str) -> dict:
+    path = Path(ref)
+    if not path.exists():
+        path = RESULTS_DIR / f"{ref}-{scale}.json"
+    if not path.exists():
+        # Короткий префикс коммита
+        matches = sorted(RESULTS_DIR.glob(f"{ref}*-{scale}.json"))
+        if not matches:
+            raise SystemExit(f"❗ Нет результатов для {ref} ({scale}) в {RESULTS_DIR}")
+        path = matches[-1]
+    return json.loads(path.read_text())
+
+
+def print_table(results: list[dict]):
+    names = list(dict.fromkeys(name for r in results for name in r["stages"]))
+    headers = [r["commit"] for r in results]
+    print(f"\n{'этап':<24}" + "".join(f"{h:>16}" for h in headers) + (f"{'Δ':>10}" if len(results) > 1 else ""))
+    for name in names:
+        values = [r["stages"].get(name) for r in results]
+        row = f"{name:<24}" + "".join(f"{v:>14.3f} с" if v is not None else f"{'—':>16}" for v in values)
+        if len(results) > 1 and values[0] and values[-1] is not None:
+            row += f"{(values[-1] / values[0] - 1) * 100:>+9.1f}%"
+        print(row)
+    for key in results[-1]["counts"]:
+        print(f"{key:<24}" + "".join(f"{r['counts'].get(key, '—'):>16}" for r in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк пайплайна на апрельских данных FIRMS")
+    parser.add_argument("--scale", choices=list(SCALES), default="april", help="Масштаб данных")
+    parser.add_argument("--repeat", type=int, default=3, help="Число повторов (берётся лучшее время)")
+    parser.add_argument("--baseline", help="Коммит или файл результатов для сравнения")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT",
+                        help="Только вывести таблицу по сохранённым результатам (коммиты или файлы)")
+    args = parser.parse_args()
+
+    if args.compare:
+        print_table([load_result(ref, args.scale) for ref in args.compare])
+        return
+
+    commit = git_revision()
+    print(f"⏱️ Бенчмарк {args.scale} на {commit}, повторов: {args.repeat}")
+    result = {
+        "commit": commit,
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **run_suite(args.scale, args.repeat),
+    }
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{commit}-{args.scale}.json"
+    path.write_text(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"💾 Результаты: {path}")
+
+    print_table([load_result(args.baseline, args.scale), result] if args.baseline else [result])
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,10 @@ from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandle
 from tg.handlers import my_regions
 from tg.handlers import (
     start, help_command, about, contacts, unsubscribe,
-    regions, region_callback, my_alerts, analyze
+    regions, region_callback, my_alerts, analyze, instant, report
 )
 
+from tg.scheduler import Scheduler, scheduler_enabled
 from utils.logger import setup_logger, error_handler
 
 # Загрузка токена и логов
@@ -16,7 +17,21 @@ load_dotenv()
 setup_logger()
 
 TOKEN = os.getenv("TELEGRAM_TOKEN")
-application = ApplicationBuilder().token(TOKEN).build()
+
+
+# Плановые анализ, рассылка и очистка внутри процесса бота (SCHEDULER_ENABLED=1)
+async def start_scheduler(app):
+    if scheduler_enabled():
+        app.bot_data["scheduler"] = Scheduler.from_env(app.bot)
+        app.bot_data["scheduler"].start()
+
+
+async def stop_scheduler(app):
+    if "scheduler" in app.bot_data:
+        await app.bot_data["scheduler"].stop()
+
+
+application = ApplicationBuilder().token(TOKEN).post_init(start_scheduler).post_shutdown(stop_scheduler).build()
 
 # Команды пользователя
 application.add_handler(CommandHandler("start", start))
@@ -26,6 +41,8 @@ application.add_handler(CommandHandler("contacts", contacts))
 application.add_handler(CommandHandler("unsubscribe", unsubscribe))
 application.add_handler(CommandHandler("regions", regions))
 application.add_handler(CommandHandler("my_alerts", my_alerts))
+application.add_handler(CommandHandler("instant", instant))
+application.add_handler(CommandHandler("report", report))
 
 # Админ-команды
 application.add_handler(CommandHandler("analyze", analyze))
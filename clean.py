@@ -3,13 +3,17 @@ from pathlib import Path
 from datetime import datetime, timedelta
 
 DATA_DIR = Path("data")
+RAW_DIR = DATA_DIR / "raw"
 DAYS_TO_KEEP = 10
 
+def is_expired(file: Path):
+    modified = datetime.fromtimestamp(file.stat().st_mtime)
+    return datetime.now() - modified > timedelta(days=DAYS_TO_KEEP)
+
 def is_old(file: Path):
     if not file.name.startswith("last_alerts"):
         return False
-    modified = datetime.fromtimestamp(file.stat().st_mtime)
-    return datetime.now() - modified > timedelta(days=DAYS_TO_KEEP)
+    return is_expired(file)
 
 def main():
     for file in DATA_DIR.glob("last_alerts*.json"):
@@ -17,5 +21,13 @@ def main():
             print(f"Удаляю устаревший файл: {file}")
             file.unlink()
 
+    # Сырые CSV FIRMS: последний файл источника не трогаем — на него ссылается state.json
+    for source_dir in RAW_DIR.glob("*/"):
+        files = sorted(source_dir.glob("*.csv"))
+        for file in files[:-1]:
+            if is_expired(file):
+                print(f"Удаляю устаревший сырой файл: {file}")
+                file.unlink()
+
 if __name__ == "__main__":
     main()
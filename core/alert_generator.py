@@ -1,33 +1,53 @@
 import logging
-from core.wiki_linker import get_wiki_url
+from core.event_clusterer import cluster_events
+from core.wiki_linker import WikiResolver
+from utils.metrics import stage
 from urllib.parse import unquote
 
 logger = logging.getLogger(__name__)
 
-def generate_alerts(matched_gdf) -> list[dict]:
+WIKI_HOME = "https://wiki.simargl-team.ru"
+
+def unique_id_to_str(value) -> str:
+    try:
+        return str(int(value)).strip()
+    except Exception as e:
+        logger.warning(f"[ALERT] Невозможно извлечь unique_id: {e}")
+        return ""
+
+def generate_alerts(matched_gdf, persist_events: bool = True) -> list[dict]:
+    """
+    Один алерт на событие пожара (core/event_clusterer.py), получившее новые точки.
+    id алерта — id события, поэтому продолжение уже разосланного пожара повторно не рассылается.
+    """
     if matched_gdf.empty:
         logger.warning("[ALERT] Нет совпадений — АЛЕРТы не формируются.")
         return []
 
     alerts = []
-    grouped = matched_gdf.groupby("unique_id")
+    with stage("events", rows_in=len(matched_gdf)) as st:
+        events = cluster_events(matched_gdf, persist=persist_events)
+        st.rows_out = len(events)
 
-    for uid, group in grouped:
-        count = len(group)
-        row = group.iloc[0]
-        region = row.get("region", "")
-        district = row.get("district", "")
-        name = f"{region} — {district}".strip("— ")
-        lat = row["latitude"]
-        lon = row["longitude"]
+    # Ссылки на вики для всех торфяников запуска — одним пакетом
+    with stage("wiki") as st:
+        resolver = WikiResolver()
+        wiki_urls = resolver.resolve_many({unique_id_to_str(event["unique_id"]) for event in events})
+        resolver.save()
+        st.rows_in = len(wiki_urls)
+        st.rows_out = sum(1 for url in wiki_urls.values() if url)
 
-        try:
-            unique_id_str = str(int(row.get("unique_id", 0))).strip()
-        except Exception as e:
-            logger.warning(f"[ALERT] Невозможно извлечь unique_id: {e}")
-            unique_id_str = ""
+    for event in events:
+        count = event["count"]
+        region = event["region"]
+        district = event["district"]
+        name = f"{region} — {district}".strip("— ")
+        # Точка алерта — центроид события
+        lat = event["lat"]
+        lon = event["lon"]
 
-        wiki_url = get_wiki_url(unique_id_str) if unique_id_str else "https://wiki.simargl-team.ru"
+        unique_id_str = unique_id_to_str(event["unique_id"])
+        wiki_url = wiki_urls.get(unique_id_str) or WIKI_HOME
 
         # Формируем читаемый заголовок
         title_raw = wiki_url.split("/")[-1]
@@ -44,7 +64,8 @@ def generate_alerts(matched_gdf) -> list[dict]:
         map_url = f"https://yandex.ru/maps/?ll={lon},{lat}&z=13"
 
         alert = {
-            "id": uid,
+            "id": event["id"],
+            "unique_id": event["unique_id"],
             "name": name,
             "count": count,
             "lat": lat,
@@ -52,10 +73,16 @@ def generate_alerts(matched_gdf) -> list[dict]:
             "wiki_url": wiki_url,
             "region": region,
             "title": title,
-            "map_url": map_url
+            "map_url": map_url,
+            "date": event["last_seen"],
+            "first_seen": event["first_seen"],
+            "last_seen": event["last_seen"],
+            "frp_total": event["frp_total"],
+            "sources": event["sources"],
         }
 
-        logger.info(f"[ALERT] 🛑 {uid} — {count} точек → {wiki_url}")
+        logger.info(f"[ALERT] 🛑 {event['id']} — {count} точек "
+                    f"({event['first_seen']} … {event['last_seen']}) → {wiki_url}")
         alerts.append(alert)
 
     return alerts
@@ -0,0 +1,104 @@
+# core/alert_snapshot.py
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from utils.files import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+ALERTS_FILE = Path("data/last_alerts.json")
+SNAPSHOT_FILE = Path("data/last_alerts_by_region.json")
+
+MESSAGE_LIMIT = 4096
+
+
+def render_region_messages(region: str, region_alerts: list[dict]) -> list[str]:
+    """
+    Ответ /my_alerts по одному региону (Markdown), разбитый на сообщения до MESSAGE_LIMIT.
+    """
+    header = f"📍 *{region}* — {len(region_alerts)} точек\n"
+    messages, text = [], header
+    for a in region_alerts:
+        line = f"- {a.get('date', 'нет даты')} {a['lat']:.4f}, {a['lon']:.4f}\n"
+        if len(text) + len(line) > MESSAGE_LIMIT:
+            messages.append(text)
+            text = ""
+        text += line
+    messages.append(text)
+    return messages
+
+
+def build_snapshot(alerts: list[dict]) -> dict:
+    by_region = {}
+    for a in alerts:
+        by_region.setdefault(a["region"], []).append(a)
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "regions": {
+            region: {"count": len(region_alerts), "messages": render_region_messages(region, region_alerts)}
+            for region, region_alerts in by_region.items()
+        },
+    }
+
+
+def publish_snapshot(alerts: list[dict]):
+    """
+    Публикует снимок алертов, проиндексированный по регионам, с готовыми текстами ответов.
+    """
+    snapshot = build_snapshot(alerts)
+    atomic_write_json(SNAPSHOT_FILE, snapshot)
+    logger.info(f"[SNAPSHOT] Опубликован снимок: {len(alerts)} алертов, {len(snapshot['regions'])} регионов")
+
+
+class AlertSnapshot:
+    """
+    Снимок в памяти процесса бота; перечитывается, когда пайплайн публикует новый.
+    """
+
+    def __init__(self):
+        self.regions = {}
+        self.source = None
+
+    def _current_source(self):
+        for path in (SNAPSHOT_FILE, ALERTS_FILE):
+            if path.exists():
+                return path, path.stat().st_mtime_ns
+        return None, None
+
+    def refresh(self):
+        path, mtime = self._current_source()
+        if (path, mtime) == self.source:
+            return
+        if path is None:
+            self.regions = {}
+        elif path == SNAPSHOT_FILE:
+            self.regions = json.loads(path.read_text())["regions"]
+        else:
+            # Снимок ещё не публиковался — строим из last_alerts.json
+            self.regions = build_snapshot(json.loads(path.read_text()))["regions"]
+        self.source = (path, mtime)
+        logger.info(f"[SNAPSHOT] Загружен снимок алертов из {path}")
+
+    def messages_for(self, regions: list[str]) -> list[str]:
+        """
+        Готовые сообщения по выбранным регионам; пустой список — все регионы.
+        """
+        self.refresh()
+        wanted = set(regions)
+        return [
+            message
+            for region, entry in self.regions.items()
+            if not wanted or region in wanted
+            for message in entry["messages"]
+        ]
+
+
+_snapshot = AlertSnapshot()
+
+
+def get_alert_snapshot() -> AlertSnapshot:
+    return _snapshot
@@ -0,0 +1,90 @@
+# core/detection_filter.py
+#
+# Фильтр качества термоточек между загрузкой и сопоставлением с полигонами:
+# детекции низкой достоверности отбрасываются до дорогого пространственного поиска.
+# Правила и пороги — в data/settings.json (detection_filter), см. utils/settings.py.
+#
+# Достоверность у сенсоров разная: MODIS — число 0–100, VIIRS — уровень l/n/h
+# (в некоторых продуктах — low/nominal/high). Колонка confidence читается категорией,
+# поэтому значения разбираются один раз на категорию, а не на строку.
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from utils.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+RULES = ("modis_confidence", "viirs_confidence", "min_frp")
+
+
+def _per_category(column: pd.Series):
+    """
+    Категории колонки и коды строк (-1 — пропуск).
+    """
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype("category")
+    return column.cat.categories.astype(str), column.cat.codes.to_numpy()
+
+
+def _take(per_category: np.ndarray, codes: np.ndarray, missing) -> np.ndarray:
+    # Значение категории для каждой строки; для пропусков (код -1) — missing
+    if not len(per_category):
+        return np.full(len(codes), missing)
+    return np.where(codes >= 0, per_category[np.maximum(codes, 0)], missing)
+
+
+def rule_masks(fire_gdf, settings: Settings) -> dict[str, np.ndarray]:
+    """
+    Строки, которые отбрасывает каждое правило (независимо от остальных).
+    Строки без значения достоверности или FRP не отбрасываются.
+    """
+    n = len(fire_gdf)
+    masks = {rule: np.zeros(n, dtype=bool) for rule in RULES}
+
+    sources = fire_gdf["source"]
+    modis_sources = [s for s in pd.unique(sources) if str(s).startswith("modis")]
+    is_modis = sources.isin(modis_sources).to_numpy()
+
+    if "confidence" in fire_gdf.columns:
+        categories, codes = _per_category(fire_gdf["confidence"])
+        numeric = pd.to_numeric(categories, errors="coerce").to_numpy(dtype="float64")
+        masks["modis_confidence"] = is_modis & (_take(numeric, codes, np.nan) < settings.modis_min_confidence)
+
+        levels = categories.str.strip().str.lower().str[:1]
+        is_level = np.isnan(numeric) & np.asarray(levels != "")
+        rejected = is_level & ~np.asarray(levels.isin(settings.viirs_confidence))
+        masks["viirs_confidence"] = ~is_modis & _take(rejected, codes, False)
+
+    if settings.min_frp > 0 and "frp" in fire_gdf.columns:
+        # NaN < порога — False: строки без FRP остаются
+        masks["min_frp"] = fire_gdf["frp"].to_numpy(dtype="float64") < settings.min_frp
+
+    return masks
+
+
+def filter_detections(fire_gdf, settings: Settings | None = None):
+    """
+    Отбрасывает термоточки низкой достоверности. Возвращает (отфильтрованные точки,
+    {правило: сколько строк оно убрало}); правила применяются по порядку RULES,
+    строка засчитывается первому сработавшему.
+    """
+    settings = settings or get_settings()
+    removed = dict.fromkeys(RULES, 0)
+    if fire_gdf.empty or not settings.filter_enabled:
+        return fire_gdf, removed
+
+    keep = np.ones(len(fire_gdf), dtype=bool)
+    for rule, mask in rule_masks(fire_gdf, settings).items():
+        dropped = mask & keep
+        removed[rule] = int(dropped.sum())
+        keep &= ~dropped
+
+    total = sum(removed.values())
+    details = ", ".join(f"{rule} −{count}" for rule, count in removed.items())
+    logger.info(f"[FILTER] Фильтр качества: {len(fire_gdf)} → {len(fire_gdf) - total} точек ({details})")
+    if not total:
+        return fire_gdf, removed
+    return fire_gdf[keep], removed
@@ -0,0 +1,101 @@
+# core/detection_store.py
+
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STORE_FILE = Path("data/processed.sqlite")
+
+# 24-часовые фиды перекрываются на сутки-двое; старше этого ключи не нужны
+RETENTION_DAYS = 10
+
+KEY_COLUMNS = ["source", "lat_e5", "lon_e5", "acq_date", "acq_time"]
+
+
+def _connect():
+    STORE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(STORE_FILE)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS processed (
+            source TEXT NOT NULL,
+            lat_e5 INTEGER NOT NULL,
+            lon_e5 INTEGER NOT NULL,
+            acq_date TEXT NOT NULL,
+            acq_time INTEGER NOT NULL,
+            processed_at TEXT NOT NULL,
+            PRIMARY KEY (source, lat_e5, lon_e5, acq_date, acq_time)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS processed_date ON processed (acq_date)")
+    return conn
+
+
+def detection_keys(fire_gdf) -> pd.DataFrame:
+    """
+    Ключ детекции: (источник без _archive, lat/lon до 1e-5°, дата, время съёмки).
+    """
+    return pd.DataFrame({
+        "source": fire_gdf["source"].astype(str).str.replace("_archive", "", regex=False).to_numpy(),
+        "lat_e5": (fire_gdf["latitude"].to_numpy(dtype="float64") * 1e5).round().astype("int64"),
+        "lon_e5": (fire_gdf["longitude"].to_numpy(dtype="float64") * 1e5).round().astype("int64"),
+        "acq_date": fire_gdf["acq_date"].astype(str).to_numpy(),
+        "acq_time": fire_gdf["acq_time"].to_numpy(dtype="int64"),
+    })
+
+
+def filter_new(fire_gdf):
+    """
+    Оставляет только термоточки, которые ещё не обрабатывались.
+    """
+    if fire_gdf.empty:
+        return fire_gdf
+
+    keys = detection_keys(fire_gdf)
+    dates = sorted(keys["acq_date"].unique())
+
+    with _connect() as conn:
+        placeholders = ",".join("?" * len(dates))
+        seen = pd.read_sql_query(
+            f"SELECT {', '.join(KEY_COLUMNS)} FROM processed WHERE acq_date IN ({placeholders})",
+            conn, params=dates,
+        )
+    conn.close()
+
+    if seen.empty:
+        logger.info(f"[INCREMENTAL] Все {len(fire_gdf)} термоточек новые")
+        return fire_gdf
+
+    is_seen = pd.MultiIndex.from_frame(keys).isin(pd.MultiIndex.from_frame(seen[KEY_COLUMNS]))
+    delta = fire_gdf[~is_seen]
+    logger.info(f"[INCREMENTAL] Новых термоточек: {len(delta)} из {len(fire_gdf)}")
+    return delta
+
+
+def mark_processed(fire_gdf):
+    """
+    Запоминает обработанные термоточки и удаляет ключи старше RETENTION_DAYS.
+    """
+    if fire_gdf.empty:
+        return
+
+    keys = detection_keys(fire_gdf)
+    keys["processed_at"] = datetime.utcnow().isoformat()
+    cutoff = (datetime.utcnow() - timedelta(days=RETENTION_DAYS)).isoformat()
+
+    with _connect() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO processed "
+            "(source, lat_e5, lon_e5, acq_date, acq_time, processed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            keys.itertuples(index=False, name=None),
+        )
+        removed = conn.execute("DELETE FROM processed WHERE processed_at < ?", (cutoff,)).rowcount
+    conn.close()
+
+    logger.info(f"[INCREMENTAL] Запомнено {len(keys)} термоточек, удалено устаревших ключей: {removed}")
@@ -0,0 +1,174 @@
+# core/event_clusterer.py
+#
+# Объединение термоточек в события пожара: точки одного торфяника, связанные цепочкой
+# соседей не дальше EVENT_DISTANCE_M и не реже EVENT_WINDOW, — одно событие.
+# Активные события хранятся между запусками, поэтому многодневный пожар остаётся
+# одним событием с постоянным id.
+
+import json
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.files import atomic_write_json
+from utils.geo_utils import local_xy, grid_pairs, connected_components
+
+logger = logging.getLogger(__name__)
+
+EVENTS_FILE = Path("data/events.json")
+
+EVENT_DISTANCE_M = 2000
+EVENT_WINDOW = timedelta(hours=48)
+
+POINT_COLUMNS = ["lat", "lon", "ts", "source", "frp"]
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+# Источник наблюдения нескольких сенсоров: "viirs_noaa20,viirs_suomi"
+SENSOR_SEPARATOR = ","
+
+
+def detection_times(gdf) -> np.ndarray:
+    """
+    Время съёмки (UTC, секунды от эпохи) из acq_date и acq_time (ЧЧММ).
+    """
+    dates = pd.to_datetime(gdf["acq_date"].astype(str)).to_numpy("datetime64[s]").astype("int64")
+    hhmm = gdf["acq_time"].to_numpy().astype("int64")
+    return dates + (hhmm // 100) * 3600 + (hhmm % 100) * 60
+
+
+def load_events(path: Path = EVENTS_FILE) -> list[dict]:
+    if not path.exists():
+        return []
+    try:
+        return json.loads(path.read_text())
+    except Exception as e:
+        logger.warning(f"[EVENTS] Не удалось прочитать {path}: {e} — начинаем с пустого списка")
+        return []
+
+
+def _point_sources(matched) -> np.ndarray:
+    # Наблюдение нескольких сенсоров (core/sensor_dedup.py) хранит их список
+    if "sensors" in matched.columns:
+        return matched["sensors"].astype(str).to_numpy()
+    return matched["source"].astype(str).str.replace("_archive", "", regex=False).to_numpy()
+
+
+def _new_points(matched) -> pd.DataFrame:
+    frp = matched["frp"] if "frp" in matched.columns else 0.0
+    return pd.DataFrame({
+        "lat": matched["latitude"].astype("float64").round(5).to_numpy(),
+        "lon": matched["longitude"].astype("float64").round(5).to_numpy(),
+        "ts": detection_times(matched),
+        "source": _point_sources(matched),
+        "frp": pd.Series(frp, index=matched.index).astype("float64").fillna(0.0).round(2).to_numpy(),
+        "unique_id": matched["unique_id"].astype("int64").to_numpy(),
+        "region": matched.get("region", pd.Series("", index=matched.index)).astype(str).to_numpy(),
+        "district": matched.get("district", pd.Series("", index=matched.index)).astype(str).to_numpy(),
+        "event": None,
+    })
+
+
+def _stored_points(events: list[dict]) -> pd.DataFrame:
+    rows = [
+        (*point, event["unique_id"], event["region"], event["district"], event["id"])
+        for event in events
+        for point in event["points"]
+    ]
+    return pd.DataFrame(rows, columns=POINT_COLUMNS + ["unique_id", "region", "district", "event"])
+
+
+def cluster_events(matched, path: Path = EVENTS_FILE, persist: bool = True) -> list[dict]:
+    """
+    Обновляет события пожаров совпадениями запуска и возвращает события,
+    в которые попали новые точки (отсортированы по времени начала).
+
+    Каждое событие: id (стабильный, "<unique_id>-<ГГГГММДДЧЧММ начала>"), центроид lat/lon,
+    first_seen/last_seen (UTC), count, frp_total, sources ({источник: точек}).
+    """
+    if matched.empty:
+        return []
+
+    stored = load_events(path)
+    points = pd.concat([_stored_points(stored), _new_points(matched)], ignore_index=True)
+    # Пустой или прочитанный из JSON фрейм даёт object-колонки — агрегации по ним идут в Python
+    points = points.astype({"lat": "float64", "lon": "float64", "ts": "int64", "frp": "float64", "unique_id": "int64"})
+    # Повторная обработка тех же детекций (например, --full) не должна раздувать события
+    points = points.drop_duplicates(subset=["source", "lat", "lon", "ts", "unique_id"], ignore_index=True)
+
+    x, y = local_xy(points["lat"].to_numpy(), points["lon"].to_numpy())
+    left, right = grid_pairs(
+        x, y, EVENT_DISTANCE_M / 2,
+        groups=points["unique_id"].to_numpy(),
+        t=points["ts"].to_numpy(), window=EVENT_WINDOW.total_seconds(),
+    )
+    points["cluster"] = connected_components(len(points), left, right)
+
+    points["new"] = points["event"].isna()
+
+    # Атрибуты всех событий — одной агрегацией по компонентам
+    summary = points.groupby("cluster", sort=False).agg(
+        unique_id=("unique_id", "first"), region=("region", "first"), district=("district", "first"),
+        lat=("lat", "mean"), lon=("lon", "mean"), first_ts=("ts", "min"), last_ts=("ts", "max"),
+        count=("ts", "size"), frp_total=("frp", "sum"), updated=("new", "any"),
+    )
+    first_seen = pd.to_datetime(summary["first_ts"], unit="s")
+    summary["first_seen"] = first_seen.dt.strftime(TIME_FORMAT)
+    summary["last_seen"] = pd.to_datetime(summary["last_ts"], unit="s").dt.strftime(TIME_FORMAT)
+
+    # Слившиеся события получают id самого раннего из них
+    first_seen_of = {event["id"]: event["first_seen"] for event in stored}
+    known = points.loc[~points["new"], ["cluster", "event"]].drop_duplicates()
+    known["first_seen"] = known["event"].map(first_seen_of)
+    known = known.sort_values(["first_seen", "event"]).drop_duplicates("cluster")
+    summary["id"] = known.set_index("cluster")["event"].reindex(summary.index)
+
+    # Новые события: "<unique_id>-<ГГГГММДДЧЧММ начала>", при совпадении — суффикс -2, -3, …
+    fresh = summary["id"].isna()
+    taken = set(summary["id"].dropna())
+    base = summary["unique_id"].astype(str) + "-" + first_seen.dt.strftime("%Y%m%d%H%M")
+    ids = []
+    for event_id in base[fresh]:
+        candidate, n = event_id, 1
+        while candidate in taken:
+            n += 1
+            candidate = f"{event_id}-{n}"
+        taken.add(candidate)
+        ids.append(candidate)
+    summary.loc[fresh, "id"] = ids
+
+    sources = {}
+    for (cluster, source), n in points.groupby(["cluster", "source"]).size().items():
+        counts = sources.setdefault(cluster, {})
+        for sensor in source.split(SENSOR_SEPARATOR):
+            counts[sensor] = counts.get(sensor, 0) + int(n)
+
+    # К событию, молчавшему дольше окна, новые точки уже не присоединятся — закрываем его
+    horizon = points["ts"].max() - EVENT_WINDOW.total_seconds()
+    active_clusters = set(summary.index[summary["last_ts"] >= horizon])
+    event_points = {}
+    kept = points[points["cluster"].isin(active_clusters)]
+    for cluster, point in zip(kept["cluster"].tolist(), kept[POINT_COLUMNS].to_numpy().tolist()):
+        event_points.setdefault(cluster, []).append(point)
+
+    summary["lat"] = summary["lat"].round(5)
+    summary["lon"] = summary["lon"].round(5)
+    summary["frp_total"] = summary["frp_total"].round(2)
+    columns = ["id", "unique_id", "region", "district", "lat", "lon", "first_seen", "last_seen", "count", "frp_total"]
+    events, active, touched = [], [], []
+    for cluster, event, updated in zip(summary.index, summary[columns].to_dict("records"), summary["updated"]):
+        event["sources"] = sources[cluster]
+        events.append(event)
+        if updated:
+            touched.append(event)
+        if cluster in active_clusters:
+            active.append({**event, "points": event_points[cluster]})
+    touched.sort(key=lambda e: (e["first_seen"], e["id"]))
+
+    if persist:
+        atomic_write_json(path, active)
+    logger.info(f"[EVENTS] {len(points)} точек → {len(events)} событий; обновлено {len(touched)}, "
+                f"активных {len(active)}")
+
+    return touched
@@ -2,9 +2,17 @@
 
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
+from pathlib import Path
+import aiohttp
+import asyncio
 import datetime
+import json
 import logging
+import time
+import zipfile
+
+from utils.files import atomic_write_bytes, atomic_write_json
+from utils.metrics import observe
 
 logger = logging.getLogger(__name__)
 
@@ -16,76 +24,344 @@ SOURCES = {
     "viirs_noaa21": "https://firms.modaps.eosdis.nasa.gov/data/active_fire/noaa-21-viirs-c2/csv/J2_VIIRS_C2_Russia_Asia_24h.csv"
 }
 
-def download_firms_data():
+# Типы колонок FIRMS; остальные колонки (scan, track, version) не читаются.
+# VIIRS в онлайн-фидах отдаёт яркость как bright_ti4/bright_ti5, MODIS и архивы — brightness/bright_t31.
+FIRMS_DTYPES = {
+    "latitude": "float32",
+    "longitude": "float32",
+    "brightness": "float32",
+    "bright_ti4": "float32",
+    "bright_t31": "float32",
+    "bright_ti5": "float32",
+    "frp": "float32",
+    "acq_date": "category",
+    "acq_time": "int16",
+    "satellite": "category",
+    "instrument": "category",
+    "confidence": "category",   # MODIS: 0–100, VIIRS: l/n/h
+    "daynight": "category",
+}
+CATEGORY_COLUMNS = [col for col, dtype in FIRMS_DTYPES.items() if dtype == "category"]
+
+# Архивы FIRMS для локального режима и коды продуктов в их именах
+ARCHIVE_DIR = Path("data/firms_april")
+ARCHIVE_PRODUCTS = {
+    "M-C61": "modis",
+    "SV-C2": "viirs_suomi",
+    "J1V-C2": "viirs_noaa20",
+    "J2V-C2": "viirs_noaa21",
+}
+
+# Сырые CSV сохраняются на диск, чтобы неудачную ночь можно было переиграть
+RAW_DIR = Path("data/raw")
+RAW_STATE_FILE = RAW_DIR / "state.json"
+
+REQUEST_TIMEOUT = 120      # секунд на один запрос
+MAX_CONNECTIONS = 8
+RETRIES = 3
+BACKOFF_BASE = 2           # секунд, удваивается с каждой попыткой
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchResult:
     """
-    Загружает термоточки из FIRMS (онлайн-источники по России и Азии).
+    Итог загрузки одного источника: new — получен новый CSV,
+    not_modified — сервер ответил 304, failed — все попытки исчерпаны.
     """
-    frames = []
-    broken_sources = []
 
-    for name, url in SOURCES.items():
+    def __init__(self, name, url, status, path=None, error=None):
+        self.name = name
+        self.url = url
+        self.status = status
+        self.path = path
+        self.error = error
+
+
+def load_raw_state() -> dict:
+    if RAW_STATE_FILE.exists():
+        return json.loads(RAW_STATE_FILE.read_text())
+    return {}
+
+
+def save_raw_state(state: dict):
+    atomic_write_json(RAW_STATE_FILE, state)
+
+
+def store_raw(name: str, content: bytes, fetched_at: datetime.datetime) -> Path:
+    path = RAW_DIR / name / f"{fetched_at:%Y%m%dT%H%M%S}.csv"
+    atomic_write_bytes(path, content)
+    return path
+
+
+def _describe(error) -> str:
+    return str(error) or type(error).__name__
+
+
+async def fetch_source(session, name: str, url: str, state: dict) -> FetchResult:
+    """
+    Условный GET одного источника с повторами и экспоненциальной задержкой.
+    """
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    last_error = None
+    for attempt in range(1, RETRIES + 1):
+        try:
+            logger.info(f"[FIRMS] Загрузка {name} → {url} (попытка {attempt})")
+            started = time.perf_counter()
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 304:
+                    observe("firms", time.perf_counter() - started)
+                    logger.info(f"[FIRMS] {name}: не изменился с прошлой загрузки")
+                    return FetchResult(name, url, "not_modified", path=state.get("path"))
+
+                if resp.status in RETRY_STATUSES:
+                    raise aiohttp.ClientResponseError(
+                        resp.request_info, resp.history, status=resp.status, message=resp.reason
+                    )
+                resp.raise_for_status()
+
+                content = await resp.read()
+                observe("firms", time.perf_counter() - started)
+                fetched_at = datetime.datetime.utcnow()
+                path = store_raw(name, content, fetched_at)
+                state.update({
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "path": str(path),
+                    "fetched_at": fetched_at.isoformat(),
+                })
+                return FetchResult(name, url, "new", path=str(path))
+
+        except aiohttp.ClientResponseError as e:
+            last_error = e
+            if e.status not in RETRY_STATUSES:
+                break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            last_error = e
+
+        if attempt < RETRIES:
+            delay = BACKOFF_BASE * 2 ** (attempt - 1)
+            logger.warning(f"[FIRMS] {name}: ошибка {_describe(last_error)}, повтор через {delay} с")
+            await asyncio.sleep(delay)
+
+    logger.error(f"[FIRMS] Ошибка загрузки {name}: {_describe(last_error)}")
+    return FetchResult(name, url, "failed", error=last_error)
+
+
+async def fetch_all_sources(sources: dict = SOURCES) -> list[FetchResult]:
+    """
+    Параллельно загружает все источники через общий пул соединений.
+    """
+    state = load_raw_state()
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        results = await asyncio.gather(*(
+            fetch_source(session, name, url, state.setdefault(name, {}))
+            for name, url in sources.items()
+        ))
+
+    save_raw_state(state)
+    return results
+
+
+def read_firms_csv(path_or_buffer, **kwargs):
+    """
+    Читает CSV FIRMS только с нужными колонками и заданными типами.
+    """
+    return pd.read_csv(
+        path_or_buffer,
+        usecols=lambda col: col in FIRMS_DTYPES,
+        dtype=FIRMS_DTYPES,
+        **kwargs,
+    )
+
+
+def _to_gdf(df, source):
+    geometry = gpd.points_from_xy(df["longitude"], df["latitude"])
+    gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+    gdf["source"] = source
+    gdf["downloaded_at"] = datetime.datetime.utcnow().isoformat()
+    return gdf
+
+
+def concat_frames(frames):
+    """
+    pd.concat превращает категории с разными наборами значений в object — восстанавливаем их.
+    """
+    result = pd.concat(frames, ignore_index=True)
+    for col in CATEGORY_COLUMNS:
+        if col in result.columns and result[col].dtype != "category":
+            result[col] = result[col].astype("category")
+    return result
+
+
+def load_raw_files(paths: dict):
+    """
+    Собирает GeoDataFrame из сохранённых сырых CSV {источник: путь}.
+    """
+    frames = []
+    for name, path in paths.items():
         try:
-            logger.info(f"[FIRMS] Загрузка {name} → {url}")
-            df = pd.read_csv(url)
+            df = read_firms_csv(path)
 
             if df.empty:
                 logger.warning(f"[FIRMS] Пустой CSV: {name}")
                 continue
 
-            geometry = [Point(xy) for xy in zip(df['longitude'], df['latitude'])]
-            gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
-            gdf["source"] = name
-            gdf["downloaded_at"] = datetime.datetime.utcnow().isoformat()
-            frames.append(gdf)
+            frames.append(_to_gdf(df, name))
 
         except Exception as e:
-            logger.error(f"[FIRMS] Ошибка загрузки {name}: {e}")
-            broken_sources.append((name, url))
+            logger.error(f"[FIRMS] Ошибка чтения {name} ({path}): {e}")
+
+    if not frames:
+        return gpd.GeoDataFrame()
+    return concat_frames(frames)
+
+
+def download_firms_data(skip_unchanged=False):
+    """
+    Загружает термоточки из FIRMS (онлайн-источники по России и Азии).
+    Источники, не изменившиеся с прошлой загрузки (304), берутся из сохранённой копии,
+    либо пропускаются при skip_unchanged=True.
+    """
+    results = asyncio.run(fetch_all_sources())
+
+    paths = {}
+    broken_sources = []
+    for result in results:
+        if result.status == "failed":
+            broken_sources.append((result.name, result.url))
+        elif result.status == "not_modified" and skip_unchanged:
+            continue
+        elif result.path:
+            paths[result.name] = result.path
 
     if broken_sources:
         logger.warning("[FIRMS] ⚠️ Не удалось загрузить источники:")
         for name, url in broken_sources:
             logger.warning(f"  ⛔ {name}: {url}")
 
-    if not frames:
-        logger.error("[FIRMS] ❌ Ни один источник не сработал.")
+    if not paths:
+        if skip_unchanged and len(broken_sources) < len(results):
+            logger.info("[FIRMS] Новых данных нет.")
+        else:
+            logger.error("[FIRMS] ❌ Ни один источник не сработал.")
         return gpd.GeoDataFrame()
 
-    result = pd.concat(frames, ignore_index=True)
-    logger.info(f"[FIRMS] ✅ Загружено {len(result)} термоточек из {len(frames)} источников.")
+    result = load_raw_files(paths)
+    logger.info(f"[FIRMS] ✅ Загружено {len(result)} термоточек из {len(paths)} источников.")
     return result
-def load_local_archives():
+
+
+def replay_raw_data(date: str | None = None):
     """
-    Загружает термоточки из локальных архивных CSV (апрель).
+    Повторно обрабатывает сохранённые сырые CSV: последний файл каждого источника
+    (за указанную дату YYYY-MM-DD, если она задана).
     """
-    base_dir = "data/firms_april"
-    files = {
-        "modis_archive": f"{base_dir}/fire_nrt_M-C61_638549.csv",
-        "viirs_suomi_archive": f"{base_dir}/fire_nrt_SV-C2_638552.csv",
-        "viirs_noaa20_archive": f"{base_dir}/fire_nrt_J1V-C2_638550.csv",
-        "viirs_noaa21_archive": f"{base_dir}/fire_nrt_J2V-C2_638551.csv"
-    }
+    prefix = date.replace("-", "") if date else ""
+    paths = {}
+    for name in SOURCES:
+        files = sorted((RAW_DIR / name).glob(f"{prefix}*.csv"))
+        if files:
+            paths[name] = files[-1]
+        else:
+            logger.warning(f"[REPLAY] Нет сохранённых данных для {name}")
 
+    if not paths:
+        logger.error("[REPLAY] ❌ Нечего переигрывать")
+        return gpd.GeoDataFrame()
+
+    logger.info(f"[REPLAY] Переигрываем: {', '.join(str(p) for p in paths.values())}")
+    return load_raw_files(paths)
+
+
+def archive_source(name: str) -> str | None:
+    """
+    Источник по имени архивного файла FIRMS: DL_FIRE_M-C61_*.zip, fire_nrt_SV-C2_*.csv, fire_archive_J1V-C2_*.csv…
+    """
+    for code, source in ARCHIVE_PRODUCTS.items():
+        if f"_{code}_" in name:
+            return f"{source}_archive"
+    return None
+
+
+def list_archive_entries(paths) -> list[tuple[str, Path, str | None]]:
+    """
+    Разворачивает файлы и каталоги в список (источник, файл, CSV внутри zip или None).
+    CSV внутри zip пропускается, если рядом лежит такой же распакованный файл.
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(path.glob("*.csv")) + sorted(path.glob("*.zip")))
+        else:
+            files.append(path)
+
+    entries = []
+    extracted = {f.name for f in files if f.suffix == ".csv"}
+    for path in files:
+        if path.suffix == ".zip":
+            with zipfile.ZipFile(path) as zf:
+                members = [n for n in zf.namelist() if n.endswith(".csv") and Path(n).name not in extracted]
+            for member in members:
+                entries.append((archive_source(member) or archive_source(path.name), path, member))
+        elif path.suffix == ".csv":
+            entries.append((archive_source(path.name), path, None))
+
+    for source, path, member in entries:
+        if source is None:
+            logger.warning(f"[ARCHIVE] Не удалось определить источник: {path} {member or ''}")
+    return [entry for entry in entries if entry[0] is not None]
+
+
+def read_archive_entry(path: Path, member: str | None = None, chunksize: int | None = None):
+    """
+    Читает архивный CSV (в том числе прямо из zip, без распаковки).
+    С chunksize возвращает итератор по частям.
+    """
+    if member is None:
+        return read_firms_csv(path, chunksize=chunksize)
+
+    zf = zipfile.ZipFile(path)
+    f = zf.open(member)
+    if chunksize is None:
+        with zf, f:
+            return read_firms_csv(f)
+
+    def chunks():
+        with zf, f:
+            yield from read_firms_csv(f, chunksize=chunksize)
+    return chunks()
+
+
+def load_local_archives(base_dir=ARCHIVE_DIR):
+    """
+    Загружает термоточки из локальных архивов FIRMS (CSV и zip) в каталоге base_dir.
+    """
     frames = []
-    for source, path in files.items():
+    for source, path, member in list_archive_entries([base_dir]):
+        label = f"{path}:{member}" if member else str(path)
         try:
-            df = pd.read_csv(path)
+            df = read_archive_entry(path, member)
             if df.empty:
-                logger.warning(f"[ARCHIVE] Пустой CSV: {path}")
+                logger.warning(f"[ARCHIVE] Пустой CSV: {label}")
                 continue
 
-            geometry = [Point(xy) for xy in zip(df['longitude'], df['latitude'])]
-            gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
-            gdf["source"] = source
-            gdf["downloaded_at"] = datetime.datetime.utcnow().isoformat()
+            gdf = _to_gdf(df, source)
             frames.append(gdf)
-            logger.info(f"[ARCHIVE] ✅ {source}: загружено {len(gdf)} точек")
+            logger.info(f"[ARCHIVE] ✅ {source}: загружено {len(gdf)} точек из {label}")
 
         except Exception as e:
-            logger.error(f"[ARCHIVE] Ошибка чтения {source}: {e}")
+            logger.error(f"[ARCHIVE] Ошибка чтения {label}: {e}")
 
     if not frames:
         logger.error("[ARCHIVE] ❌ Ни один архив не загружен")
         return gpd.GeoDataFrame()
 
-    return pd.concat(frames, ignore_index=True)
+    return concat_frames(frames)
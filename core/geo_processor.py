@@ -2,20 +2,115 @@
 
 import geopandas as gpd
 import pandas as pd
-from shapely.geometry import Point
+import pyarrow.parquet as pq
+from pyproj import Transformer
+from shapely import STRtree, from_wkb
+from pathlib import Path
+import hashlib
+import io
+import json
 import logging
 
+from utils.files import atomic_write_bytes, atomic_write_json
+from utils.settings import get_settings
+
 logger = logging.getLogger(__name__)
 
 POLYGON_PATH = "data/Final_CFO(9region).geojson"
 
-# Погрешности по источнику в метрах
-SOURCE_TOLERANCE = {
-    "modis": 1000,
-    "viirs_suomi": 300,
-    "viirs_noaa20": 375,
-    "viirs_noaa21": 375
-}
+# Скомпилированный кэш полигонов: GeoParquet (4326 + 3857) и метаданные исходника
+POLYGON_CACHE_PATH = Path("data/cache/polygons.parquet")
+POLYGON_CACHE_META = Path("data/cache/polygons.meta.json")
+CACHE_VERSION = 1
+
+# Метрическая проекция, в которой задаются погрешности
+METRIC_CRS = "EPSG:3857"
+
+_TO_LONLAT = Transformer.from_crs(METRIC_CRS, "EPSG:4326", always_xy=True)
+
+
+class PolygonIndexUnavailable(RuntimeError):
+    """
+    Полигоны не загружены (нет GeoJSON, файл не читается, кэш не собрался):
+    сопоставлять не с чем, и термоточки нельзя считать обработанными.
+    """
+
+
+def get_tolerance(source: str) -> int:
+    # Погрешности по источнику задаются в data/settings.json (source_tolerance)
+    return get_settings().tolerance(source)
+
+
+class PolygonIndex:
+    """
+    Полигоны торфяников, подготовленные для поиска совпадений:
+    проекция в метры, STRtree и охватывающий прямоугольник строятся один раз.
+    """
+
+    def __init__(self, polygon_gdf, polygons_m=None):
+        self.polygons = polygon_gdf
+        self.polygons_m = polygons_m if polygons_m is not None else polygon_gdf.to_crs(METRIC_CRS)
+        self.attributes = pd.DataFrame(polygon_gdf.drop(columns=polygon_gdf.geometry.name))
+        self.tree = STRtree(self.polygons_m.geometry.values)
+        self.bounds_m = self.polygons_m.total_bounds
+
+    def __len__(self):
+        return len(self.polygons)
+
+    @property
+    def empty(self):
+        return self.polygons.empty
+
+    def lonlat_bounds(self, margin_m: float):
+        """
+        Охватывающий прямоугольник полигонов (lon/lat), расширенный на margin_m метров EPSG:3857.
+        Проекция разделима по осям, поэтому углы переводятся точно.
+        """
+        minx, miny, maxx, maxy = self.bounds_m
+        lon, lat = _TO_LONLAT.transform(
+            [minx - margin_m, maxx + margin_m],
+            [miny - margin_m, maxy + margin_m],
+        )
+        return lon[0], lat[0], lon[1], lat[1]
+
+    def prefilter(self, fire_points_gdf, margin_m: float):
+        """
+        Векторная маска точек, попадающих в охватывающий прямоугольник полигонов.
+        """
+        min_lon, min_lat, max_lon, max_lat = self.lonlat_bounds(margin_m)
+        if {"longitude", "latitude"}.issubset(fire_points_gdf.columns):
+            lon = fire_points_gdf["longitude"].to_numpy()
+            lat = fire_points_gdf["latitude"].to_numpy()
+        else:
+            lon = fire_points_gdf.geometry.x.to_numpy()
+            lat = fire_points_gdf.geometry.y.to_numpy()
+        return (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+
+    def query(self, fire_points_gdf, tolerance_m: float):
+        """
+        Пары (позиция точки, позиция полигона) на расстоянии не более tolerance_m.
+        """
+        points_m = fire_points_gdf.geometry.to_crs(METRIC_CRS).values
+        point_idx, poly_idx = self.tree.query(points_m, predicate="dwithin", distance=tolerance_m)
+        return point_idx, poly_idx
+
+    def join(self, fire_points_gdf, point_idx, poly_idx):
+        """
+        Собирает результат в формате gpd.sjoin: колонки точки, index_right, атрибуты полигона.
+        """
+        left = fire_points_gdf.iloc[point_idx].reset_index(drop=True)
+        right = self.attributes.iloc[poly_idx]
+        index_right = pd.Series(right.index, name="index_right")
+        right = right.reset_index(drop=True)
+
+        overlap = left.columns.intersection(right.columns)
+        if len(overlap):
+            left = left.rename(columns={c: f"{c}_left" for c in overlap})
+            right = right.rename(columns={c: f"{c}_right" for c in overlap})
+
+        joined = pd.concat([left, index_right, right], axis=1)
+        return gpd.GeoDataFrame(joined, geometry=fire_points_gdf.geometry.name, crs=fire_points_gdf.crs)
+
 
 def load_polygons():
     """
@@ -37,36 +132,192 @@ def load_polygons():
         logger.error(f"[POLYGONS] Ошибка загрузки: {e}")
         return gpd.GeoDataFrame()
 
-def find_matches_with_tolerance(fire_points_gdf, polygon_gdf):
+
+def build_polygon_index(polygon_gdf) -> PolygonIndex | None:
+    if polygon_gdf.empty:
+        return None
+    return PolygonIndex(polygon_gdf)
+
+
+def _file_hash(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_state(path) -> dict:
+    stat = Path(path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_cache_meta() -> dict:
+    if POLYGON_CACHE_META.exists():
+        try:
+            return json.loads(POLYGON_CACHE_META.read_text())
+        except ValueError:
+            logger.warning("[POLYGONS] Повреждены метаданные кэша — будет пересобран")
+    return {}
+
+
+def _cache_is_fresh(meta: dict, state: dict) -> tuple[bool, str | None]:
+    """
+    Кэш актуален, если совпадает хэш исходного GeoJSON.
+    Пока размер и mtime не менялись, файл не хэшируется повторно.
+    """
+    if meta.get("version") != CACHE_VERSION or not POLYGON_CACHE_PATH.exists():
+        return False, None
+    if meta.get("source_state") == state:
+        return True, meta.get("source_hash")
+    source_hash = _file_hash(POLYGON_PATH)
+    if meta.get("source_hash") != source_hash:
+        return False, source_hash
+    # Файл тронули (touch, копирование), но содержимое прежнее — запоминаем новые размер и mtime,
+    # иначе он хэшировался бы при каждой загрузке
+    try:
+        atomic_write_json(POLYGON_CACHE_META, {**meta, "source_state": state})
+    except OSError as e:
+        logger.warning(f"[POLYGONS] Не удалось обновить метаданные кэша: {e}")
+    return True, source_hash
+
+
+def _read_polygon_cache():
     """
-    Ищет пересечения с учётом буфера (погрешности) по источнику.
+    Читает GeoParquet напрямую через pyarrow: CRS известны заранее,
+    а разбор CRS-метаданных в gpd.read_parquet занимает больше, чем само чтение.
     """
-    if fire_points_gdf.empty or polygon_gdf.empty:
+    table = pq.read_table(POLYGON_CACHE_PATH)
+    attributes = table.drop_columns(["geometry", "geometry_3857"]).to_pandas()
+    polygons = gpd.GeoDataFrame(
+        attributes, geometry=from_wkb(table.column("geometry").to_numpy()), crs="EPSG:4326"
+    )
+    polygons_m = gpd.GeoDataFrame(
+        geometry=from_wkb(table.column("geometry_3857").to_numpy()), index=attributes.index, crs=METRIC_CRS
+    )
+    return polygons, polygons_m
+
+
+def build_polygon_cache(source_hash: str | None = None) -> PolygonIndex | None:
+    """
+    Пересобирает кэш полигонов из GeoJSON и возвращает готовый индекс.
+    """
+    polygon_gdf = load_polygons()
+    if polygon_gdf.empty:
+        return None
+
+    index = PolygonIndex(polygon_gdf)
+    try:
+        cached = polygon_gdf.copy()
+        cached["geometry_3857"] = gpd.GeoSeries(index.polygons_m.geometry.values, crs=METRIC_CRS)
+        buffer = io.BytesIO()
+        cached.to_parquet(buffer)
+        atomic_write_bytes(POLYGON_CACHE_PATH, buffer.getvalue())
+
+        meta = {
+            "version": CACHE_VERSION,
+            "source": POLYGON_PATH,
+            "source_hash": source_hash or _file_hash(POLYGON_PATH),
+            "source_state": _source_state(POLYGON_PATH),
+            "bounds_3857": [float(v) for v in index.bounds_m],
+            "count": len(polygon_gdf),
+        }
+        atomic_write_json(POLYGON_CACHE_META, meta)
+        logger.info(f"[POLYGONS] Кэш пересобран: {POLYGON_CACHE_PATH}")
+    except Exception as e:
+        logger.error(f"[POLYGONS] Не удалось сохранить кэш: {e}")
+
+    return index
+
+
+def load_polygon_index() -> PolygonIndex | None:
+    """
+    Загружает индекс полигонов из кэша; кэш пересобирается, только если изменился GeoJSON.
+    """
+    try:
+        fresh, source_hash = _cache_is_fresh(_read_cache_meta(), _source_state(POLYGON_PATH))
+    except OSError as e:
+        logger.error(f"[POLYGONS] Исходный файл недоступен: {e}")
+        return None
+
+    if not fresh:
+        return build_polygon_cache(source_hash)
+
+    try:
+        cached, polygons_m = _read_polygon_cache()
+        logger.info(f"[POLYGONS] Загружено {len(cached)} полигонов из кэша {POLYGON_CACHE_PATH}")
+        return PolygonIndex(cached, polygons_m=polygons_m)
+    except Exception as e:
+        logger.warning(f"[POLYGONS] Кэш не читается ({e}) — пересобираем")
+        return build_polygon_cache(source_hash)
+
+
+def enabled_polygons(index: PolygonIndex | None, settings) -> PolygonIndex | None:
+    """
+    Индекс без полигонов выключенных регионов (regions_enabled в data/settings.json):
+    их термоточки не сопоставляются вовсе.
+    """
+    if index is None or not settings.disabled_regions or "region" not in index.polygons.columns:
+        return index
+    mask = index.polygons["region"].map(settings.is_region_enabled).to_numpy(dtype=bool)
+    if mask.all():
+        return index
+    logger.info(f"[POLYGONS] Выключены регионы {', '.join(sorted(settings.disabled_regions))}: "
+                f"пропущено {int((~mask).sum())} из {len(mask)} полигонов")
+    return PolygonIndex(index.polygons[mask], polygons_m=index.polygons_m[mask])
+
+
+_full_index = None
+_full_index_state = None
+_polygon_index = None
+_polygon_index_key = None
+
+
+def get_polygon_index() -> PolygonIndex | None:
+    """
+    Индекс полигонов для долгоживущих процессов (бот): держится в памяти
+    и перестраивается, только когда меняется исходный GeoJSON или набор выключенных регионов.
+    """
+    global _full_index, _full_index_state, _polygon_index, _polygon_index_key
+    try:
+        state = _source_state(POLYGON_PATH)
+    except OSError:
+        state = None
+    if _full_index is None or state != _full_index_state:
+        _full_index = load_polygon_index()
+        _full_index_state = state
+        _polygon_index_key = None
+    settings = get_settings()
+    if _polygon_index_key != settings.disabled_regions:
+        _polygon_index = enabled_polygons(_full_index, settings)
+        _polygon_index_key = settings.disabled_regions
+    return _polygon_index
+
+
+def find_matches_with_tolerance(fire_points_gdf, polygons):
+    """
+    Ищет точки в пределах погрешности источника от полигонов.
+    polygons — PolygonIndex или GeoDataFrame (индекс будет построен на месте).
+    """
+    if isinstance(polygons, gpd.GeoDataFrame):
+        polygons = build_polygon_index(polygons)
+
+    if fire_points_gdf.empty or polygons is None or polygons.empty:
         logger.warning("[MATCH+TOLERANCE] Нет данных для анализа")
         return gpd.GeoDataFrame()
 
-    # Убедимся, что CRS совпадают
-    if fire_points_gdf.crs != polygon_gdf.crs:
-        polygon_gdf = polygon_gdf.to_crs(fire_points_gdf.crs)
-
     results = []
 
     for source, group in fire_points_gdf.groupby("source"):
-        base_name = source.replace("_archive", "")  # удаляем _archive, если есть
-        tolerance_m = SOURCE_TOLERANCE.get(base_name, 500)
-
-        # Преобразуем в метры
-        group = group.to_crs(epsg=3857)
-        polygons_m = polygon_gdf.to_crs(epsg=3857)
-
-        # Создаём буфер вокруг точки
-        group["geometry"] = group.geometry.buffer(tolerance_m)
+        tolerance_m = get_tolerance(source)
 
-        # Ищем пересечения с полигонами
-        matches = gpd.sjoin(group, polygons_m, how="inner", predicate="intersects")
+        # Отбрасываем точки вне охватывающего прямоугольника торфяников
+        inside = polygons.prefilter(group, tolerance_m)
+        candidates = group[inside]
+        logger.info(f"[MATCH+TOLERANCE] {source}: {len(candidates)} из {len(group)} точек в охвате полигонов")
 
-        # Возвращаем в долготу/широту
-        matches = matches.to_crs("EPSG:4326")
+        point_idx, poly_idx = polygons.query(candidates, tolerance_m)
+        matches = polygons.join(candidates, point_idx, poly_idx)
         results.append(matches)
 
         logger.info(f"[MATCH+TOLERANCE] {source}: {len(matches)} совпадений при ±{tolerance_m} м")
@@ -0,0 +1,170 @@
+# core/history.py
+
+import logging
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = Path("data/history")
+DETECTIONS_DIR = HISTORY_DIR / "detections"
+ALERTS_DIR = HISTORY_DIR / "alerts"
+
+# Колонки совпадений, которые сохраняются в историю
+DETECTION_COLUMNS = {
+    "source": pa.string(),
+    "latitude": pa.float32(),
+    "longitude": pa.float32(),
+    "acq_date": pa.string(),
+    "acq_time": pa.int16(),
+    "satellite": pa.string(),
+    "instrument": pa.string(),
+    "confidence": pa.string(),
+    "daynight": pa.string(),
+    "frp": pa.float32(),
+    "unique_id": pa.int64(),
+    "region": pa.string(),
+    "district": pa.string(),
+}
+DETECTION_KEY = ["source", "latitude", "longitude", "acq_date", "acq_time", "unique_id"]
+
+ALERT_COLUMNS = {
+    "id": pa.string(),
+    "region": pa.string(),
+    "name": pa.string(),
+    "title": pa.string(),
+    "count": pa.int32(),
+    "lat": pa.float64(),
+    "lon": pa.float64(),
+    "wiki_url": pa.string(),
+}
+
+# Партиции по дате в стиле hive: detections/acq_date=2025-04-01/…, alerts/date=2025-04-01/…
+DETECTION_PARTITIONING = ds.partitioning(pa.schema([("acq_date", pa.string())]), flavor="hive")
+ALERT_PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def _detections_table(matched, run_id: str) -> pa.Table:
+    df = pd.DataFrame(index=matched.index)
+    for col in DETECTION_COLUMNS:
+        if col not in matched.columns:
+            df[col] = None
+        elif col in ("latitude", "longitude", "frp", "acq_time", "unique_id"):
+            df[col] = matched[col]
+        else:
+            df[col] = matched[col].astype(str)
+    df["source"] = df["source"].str.replace("_archive", "", regex=False)
+    schema = pa.schema(list(DETECTION_COLUMNS.items()) + [("run_id", pa.string())])
+    df["run_id"] = run_id
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _alerts_table(alerts: list[dict], run_id: str, run_date: str) -> pa.Table:
+    df = pd.DataFrame([{col: alert.get(col) for col in ALERT_COLUMNS} for alert in alerts])
+    df["id"] = [str(int(a)) if isinstance(a, float) and a.is_integer() else str(a) for a in df["id"]]
+    df["run_id"] = run_id
+    df["date"] = run_date
+    schema = pa.schema(list(ALERT_COLUMNS.items()) + [("run_id", pa.string()), ("date", pa.string())])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def append_run(matched, alerts: list[dict], run_id: str | None = None):
+    """
+    Дописывает совпадения и алерты запуска в историю (Parquet, партиции по дате).
+    """
+    if matched.empty:
+        return
+
+    run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    basename = f"run-{run_id}-{{i}}.parquet"
+
+    pq.write_to_dataset(
+        _detections_table(matched, run_id), DETECTIONS_DIR,
+        partitioning=DETECTION_PARTITIONING, basename_template=basename,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    if alerts:
+        pq.write_to_dataset(
+            _alerts_table(alerts, run_id, datetime.now().strftime("%Y-%m-%d")), ALERTS_DIR,
+            partitioning=ALERT_PARTITIONING, basename_template=basename,
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    logger.info(f"[HISTORY] Запуск {run_id}: сохранено {len(matched)} совпадений и {len(alerts)} алертов")
+
+
+def _date_filter(field: str, start: str | None, end: str | None):
+    expr = None
+    if start:
+        expr = ds.field(field) >= start
+    if end:
+        cond = ds.field(field) <= end
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def load_detections(start: str | None = None, end: str | None = None, unique_id=None,
+                    columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Совпадения за период [start, end] (YYYY-MM-DD); читаются только нужные партиции.
+    Повторы одной детекции (например, после запуска с --full) отбрасываются.
+    """
+    if not DETECTIONS_DIR.exists():
+        return pd.DataFrame(columns=list(DETECTION_COLUMNS))
+
+    dataset = ds.dataset(DETECTIONS_DIR, format="parquet", partitioning=DETECTION_PARTITIONING)
+    expr = _date_filter("acq_date", start, end)
+    if unique_id is not None:
+        cond = ds.field("unique_id") == int(unique_id)
+        expr = cond if expr is None else expr & cond
+
+    if columns is not None:
+        columns = list(dict.fromkeys(columns + DETECTION_KEY))
+    df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+    return df.drop_duplicates(subset=DETECTION_KEY, ignore_index=True)
+
+
+def load_alerts(start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    if not ALERTS_DIR.exists():
+        return pd.DataFrame(columns=list(ALERT_COLUMNS) + ["run_id", "date"])
+    dataset = ds.dataset(ALERTS_DIR, format="parquet", partitioning=ALERT_PARTITIONING)
+    return dataset.to_table(filter=_date_filter("date", start, end)).to_pandas()
+
+
+def detections_for_peatland(unique_id, days: int = 30) -> pd.DataFrame:
+    """
+    Все совпадения по торфянику за последние days дней.
+    """
+    start = (date.today() - timedelta(days=days)).isoformat()
+    df = load_detections(start=start, unique_id=unique_id)
+    return df.sort_values(["acq_date", "acq_time"], ignore_index=True)
+
+
+def daily_region_counts(start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    """
+    Число совпадений по регионам и дням: строки — даты, колонки — регионы.
+    """
+    df = load_detections(start, end, columns=["region"])
+    if df.empty:
+        return pd.DataFrame()
+    return df.groupby(["acq_date", "region"]).size().unstack(fill_value=0).sort_index()
+
+
+def recurrence(start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    """
+    Повторяемость по торфяникам: число дней с термоточками, первая и последняя дата.
+    """
+    df = load_detections(start, end, columns=["region", "district"])
+    if df.empty:
+        return pd.DataFrame()
+    return (
+        df.groupby("unique_id")
+        .agg(region=("region", "first"), district=("district", "first"),
+             days=("acq_date", "nunique"), detections=("acq_date", "size"),
+             first_seen=("acq_date", "min"), last_seen=("acq_date", "max"))
+        .sort_values("days", ascending=False)
+    )
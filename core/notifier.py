@@ -1,17 +1,23 @@
 import logging
 
+from utils.templates import load_template
+
 logger = logging.getLogger(__name__)
 
-ALERT_TEMPLATE = (
-    "🛑 АЛЕРТ: Обнаружена термоточка в торфянике \"{title}\"!\n"
-    "📍 Координаты в регионе {region}: <a href=\"{map_url}\">{lat:.5f}, {lon:.5f}</a>\n"
-    "🚨 Необходимо выездное обследование!\n"
-    "🔗 <a href=\"{wiki_url}\">Подробности в вики</a>"
+# Поля алерта (core/alert_generator.generate_alerts), доступные шаблону templates/alert.txt
+ALERT_FIELDS = (
+    "id", "unique_id", "name", "count", "lat", "lon", "wiki_url", "region", "title", "map_url",
+    "date", "first_seen", "last_seen", "frp_total", "sources",
 )
 
+# Шаблон проверяется при импорте: неизвестное поле — ошибка запуска, а не каждого сообщения
+ALERT_TEMPLATE = load_template("alert", ALERT_FIELDS)
+
 def format_alert_message(alert: dict) -> str:
-    try:
-        return ALERT_TEMPLATE.format(**alert)
-    except KeyError as e:
-        logger.error(f"[NOTIFIER] Пропущено поле при генерации сообщения: {e}")
-        return f"[Ошибка генерации уведомления для {alert.get('id')}]"
+    return ALERT_TEMPLATE.render(alert)
+
+def format_alert_messages(alerts: list[dict]) -> list[str]:
+    """
+    Тексты алертов для всей рассылки одним проходом.
+    """
+    return ALERT_TEMPLATE.render_many(alerts)
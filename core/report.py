@@ -0,0 +1,198 @@
+# core/report.py
+#
+# Ежедневный отчёт по совпадениям запуска: агрегаты по торфяникам и регионам,
+# критичные торфяники (не меньше alert_threshold точек или торфяник из critical_keys)
+# и текст по шаблону templates/report.txt. Пайплайн публикует отчёт в data/last_report.json,
+# бот отдаёт готовые тексты: админам — полный, подписчикам — по их регионам.
+
+import json
+import logging
+from datetime import date, datetime
+from pathlib import Path
+
+from utils.files import atomic_write_json
+from utils.settings import Settings, get_settings
+from utils.templates import load_template
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILE = Path("data/last_report.json")
+ADMIN_AUDIENCE = "admins"
+
+
+def aggregate_matches(matched, alerts=(), settings: Settings | None = None) -> list[dict]:
+    """
+    Агрегаты по торфяникам одной группировкой по (регион, unique_id): точек, сумма FRP,
+    последняя съёмка. Регионы, выключенные в regions_enabled, не учитываются.
+    Названия торфяников берутся из алертов запуска (страница вики), иначе — район и id.
+    """
+    # pandas нужен только пайплайну — модуль импортирует и бот
+    import pandas as pd
+    from core.alert_generator import WIKI_HOME
+    from core.event_clusterer import detection_times, TIME_FORMAT
+
+    settings = settings or get_settings()
+    if matched.empty:
+        return []
+
+    frame = pd.DataFrame({
+        "region": matched["region"].astype(str).to_numpy(),
+        "unique_id": matched["unique_id"].astype("int64").to_numpy(),
+        "district": matched.get("district", pd.Series("", index=matched.index)).astype(str).to_numpy(),
+        "frp": matched["frp"].astype("float64").fillna(0.0).to_numpy() if "frp" in matched.columns else 0.0,
+        "ts": detection_times(matched),
+    })
+    if settings.disabled_regions:
+        frame = frame[frame["region"].map(settings.is_region_enabled).to_numpy(dtype=bool)]
+
+    peatlands = frame.groupby(["region", "unique_id"], sort=False).agg(
+        district=("district", "first"), points=("ts", "size"), frp=("frp", "sum"), last_ts=("ts", "max"),
+    ).reset_index()
+    peatlands["frp"] = peatlands["frp"].round(2)
+    peatlands["last_seen"] = pd.to_datetime(peatlands["last_ts"], unit="s").dt.strftime(TIME_FORMAT)
+
+    titles = {int(alert["unique_id"]): alert["title"] for alert in alerts if alert.get("wiki_url") != WIKI_HOME}
+    rows = peatlands.drop(columns="last_ts").to_dict("records")
+    for row in rows:
+        row["unique_id"] = int(row["unique_id"])
+        row["points"] = int(row["points"])
+        district = row.pop("district")
+        row["title"] = titles.get(row["unique_id"]) or f"{district.title()} (id {row['unique_id']})".strip()
+    return rows
+
+
+def merge_peatlands(previous: list[dict], rows: list[dict]) -> list[dict]:
+    """
+    Складывает агрегаты торфяников двух запусков (режим опроса: каждый опрос видит только новые точки).
+    """
+    merged = {(row["region"], row["unique_id"]): dict(row) for row in previous}
+    for row in rows:
+        key = (row["region"], row["unique_id"])
+        if key not in merged:
+            merged[key] = dict(row)
+            continue
+        entry = merged[key]
+        entry["points"] += row["points"]
+        entry["frp"] = round(entry["frp"] + row["frp"], 2)
+        entry["last_seen"] = max(entry["last_seen"], row["last_seen"])
+        entry["title"] = row["title"]
+    return list(merged.values())
+
+
+def is_critical(row: dict, settings: Settings) -> bool:
+    keys = settings.critical_keys
+    return row["points"] >= settings.alert_threshold or str(row["unique_id"]) in keys or row["title"] in keys
+
+
+def region_totals(peatlands: list[dict]) -> dict:
+    regions = {}
+    for row in peatlands:
+        entry = regions.setdefault(row["region"], {"points": 0, "peatlands": 0, "critical": 0})
+        entry["points"] += row["points"]
+        entry["peatlands"] += 1
+        entry["critical"] += row["critical"]
+    return dict(sorted(regions.items(), key=lambda item: -item[1]["points"]))
+
+
+# Отчёт отправляется простым текстом — без HTML-экранирования
+REPORT_TEMPLATE = load_template("report", ("total", "critical_list"), escape_html=False)
+
+
+def render_report(report: dict, regions=None, with_regions: bool = False) -> str:
+    """
+    Текст отчёта по шаблону для набора регионов (None или пустой — все регионы);
+    with_regions — добавить разбивку по регионам (отчёт для админов).
+    """
+    wanted = set(regions or ())
+    rows = [row for row in report["peatlands"] if not wanted or row["region"] in wanted]
+    critical = sorted((row for row in rows if row["critical"]), key=lambda row: (-row["points"], row["title"]))
+    critical_list = "\n".join(
+        f"• {row['title']} — {row['region']}: {row['points']} точек, FRP {row['frp']:g}" for row in critical
+    ) or "— нет"
+    text = REPORT_TEMPLATE.render({"total": sum(row["points"] for row in rows), "critical_list": critical_list})
+    if with_regions and rows:
+        text += "\n\nПо регионам:\n" + "\n".join(
+            f"📍 {region}: {entry['points']} точек в {entry['peatlands']} торфяниках"
+            for region, entry in region_totals(rows).items()
+        )
+    return text
+
+
+def load_report(path: Path = REPORT_FILE) -> dict | None:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except Exception as e:
+        logger.warning(f"[REPORT] Не удалось прочитать {path}: {e}")
+        return None
+
+
+def publish_report(matched, alerts=(), accumulate: bool = False, path: Path = REPORT_FILE) -> dict:
+    """
+    Строит отчёт запуска и сохраняет его вместе с готовым текстом для админов.
+    accumulate — добавить к отчёту того же дня (частые запуски режима опроса).
+    """
+    settings = get_settings()
+    peatlands = aggregate_matches(matched, alerts, settings)
+    today = date.today().isoformat()
+
+    previous = load_report(path) if accumulate else None
+    if previous and previous.get("date") == today:
+        peatlands = merge_peatlands(previous["peatlands"], peatlands)
+
+    for row in peatlands:
+        row["critical"] = is_critical(row, settings)
+    report = {
+        "date": today,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "alert_threshold": settings.alert_threshold,
+        "peatlands": sorted(peatlands, key=lambda row: (row["region"], -row["points"], row["unique_id"])),
+    }
+    report["regions"] = region_totals(report["peatlands"])
+    report["texts"] = {ADMIN_AUDIENCE: render_report(report, with_regions=True)}
+    atomic_write_json(path, report)
+    logger.info(f"[REPORT] Отчёт: {sum(r['points'] for r in peatlands)} точек, {len(peatlands)} торфяников, "
+                f"критичных {sum(r['critical'] for r in peatlands)}")
+    return report
+
+
+class ReportCache:
+    """
+    Отчёт в памяти процесса бота: перечитывается, когда пайплайн публикует новый.
+    Текст для каждой аудитории (админы, набор регионов подписчика) рендерится один раз.
+    """
+
+    def __init__(self, path: Path = REPORT_FILE):
+        self.path = path
+        self.report = None
+        self.mtime = None
+        self.texts = {}
+
+    def refresh(self):
+        mtime = self.path.stat().st_mtime_ns if self.path.exists() else None
+        if mtime == self.mtime:
+            return
+        self.report = load_report(self.path)
+        self.mtime = mtime
+        self.texts = dict(self.report.get("texts", {})) if self.report else {}
+
+    def text_for(self, regions=None, admin: bool = False) -> str | None:
+        """
+        Текст отчёта: для админов — полный, иначе — по регионам подписчика (пусто — все).
+        None — отчёта ещё нет.
+        """
+        self.refresh()
+        if self.report is None:
+            return None
+        key = ADMIN_AUDIENCE if admin else tuple(sorted(regions or ()))
+        if key not in self.texts:
+            self.texts[key] = render_report(self.report, regions, with_regions=admin)
+        return self.texts[key]
+
+
+_cache = ReportCache()
+
+
+def get_report_cache() -> ReportCache:
+    return _cache
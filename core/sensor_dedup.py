@@ -0,0 +1,119 @@
+# core/sensor_dedup.py
+#
+# Один пожар обычно видят несколько сенсоров (MODIS, Suomi NPP, NOAA-20, NOAA-21) с разницей
+# в минуты. Детекции разных сенсоров, лежащие в пределах суммы их погрешностей и окна
+# по времени, сливаются в одно наблюдение со списком сенсоров — иначе одна вспышка
+# считается в событиях несколько раз.
+#
+# В пайплайне слияние идёт после сопоставления, по совпадениям одного торфяника (by="unique_id"):
+# каждая детекция уже попала в полигон со своей погрешностью, и координаты слитых сенсоров
+# не теряют совпадений. Пары ищутся пространственным хэшем (utils/geo_utils.grid_pairs),
+# поэтому время растёт линейно с числом точек — годится и для полного фида России и Азии.
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from core.event_clusterer import SENSOR_SEPARATOR, detection_times
+from utils.geo_utils import local_xy, grid_pairs
+from utils.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _sensor_codes(sources: pd.Series):
+    """
+    Код сенсора каждой строки и имена сенсоров (без суффикса _archive).
+    """
+    codes, uniques = pd.factorize(sources)
+    names = [str(source).replace("_archive", "") for source in uniques]
+    sensor_names = sorted(set(names))
+    sensor_of_source = np.array([sensor_names.index(name) for name in names], dtype="int64")
+    return sensor_of_source[codes], list(uniques), sensor_names
+
+
+def collapse_cross_sensor(fire_gdf, settings: Settings | None = None, by: str | None = None):
+    """
+    Сливает детекции разных сенсоров одного пожара. Возвращает точки, где каждая строка —
+    наблюдение: координаты и атрибуты самой точной детекции группы (наименьшая погрешность),
+    sensors — сенсоры через запятую, detections — сколько детекций слито.
+    В наблюдении не больше одной детекции каждого сенсора: соседние пиксели одного сенсора
+    остаются отдельными точками. by — колонка, внутри значений которой идёт слияние
+    (например, unique_id торфяника).
+    """
+    settings = settings or get_settings()
+    if fire_gdf.empty or not settings.dedup_enabled:
+        return fire_gdf
+
+    n = len(fire_gdf)
+    sensor, sources, sensor_names = _sensor_codes(fire_gdf["source"])
+    lat = fire_gdf["latitude"].to_numpy(dtype="float64")
+    lon = fire_gdf["longitude"].to_numpy(dtype="float64")
+
+    # Погрешности заданы в метрах EPSG:3857 — на местности они меньше в cos(широты) раз
+    source_codes = pd.factorize(fire_gdf["source"])[0]
+    tolerance = np.array([settings.tolerance(str(source)) for source in sources], dtype="float64")[source_codes]
+    radius = tolerance * np.cos(np.radians(lat))
+
+    # Ранг точности: меньшая погрешность, затем сенсор, затем порядок строки
+    rank = np.empty(n, dtype="int64")
+    rank[np.lexsort((np.arange(n), sensor, tolerance))] = np.arange(n)
+
+    group = np.arange(n)
+    if len(sensor_names) > 1:
+        x, y = local_xy(lat, lon)
+        groups = fire_gdf[by].to_numpy() if by else None
+        left, right = grid_pairs(
+            x, y, radius, groups=groups,
+            t=detection_times(fire_gdf), window=settings.dedup_window_seconds,
+        )
+        cross = sensor[left] != sensor[right]
+        # Пары в обе стороны: point — детекция, other — её сосед другого сенсора
+        point = np.concatenate([left[cross], right[cross]])
+        other = np.concatenate([right[cross], left[cross]])
+
+        # Якорь — детекция, рядом с которой нет более точной детекции другого сенсора.
+        # Группы — «звёзды» вокруг якорей, поэтому цепочки соседей не склеивают весь фронт пожара
+        best = np.full(n, n, dtype="int64")
+        np.minimum.at(best, point, rank[other])
+        anchor = best > rank
+
+        joins = ~anchor[point] & anchor[other]
+        point, other = point[joins], other[joins]
+        distance = (x[point] - x[other]) ** 2 + (y[point] - y[other]) ** 2
+
+        # Каждая детекция — к ближайшему якорю
+        order = np.lexsort((rank[other], distance, point))
+        first = np.r_[True, point[order][1:] != point[order][:-1]]
+        point, other, distance = point[order][first], other[order][first], distance[order][first]
+
+        # У якоря не больше одной детекции каждого сенсора — ближайшая
+        key = other * len(sensor_names) + sensor[point]
+        order = np.lexsort((distance, key))
+        first = np.r_[True, key[order][1:] != key[order][:-1]]
+        group[point[order][first]] = other[order][first]
+
+    # Представитель группы — якорь (наименьший ранг)
+    order = np.lexsort((rank, group))
+    sorted_group = group[order]
+    starts = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]])
+    representatives = order[starts]
+    detections = np.diff(np.r_[starts, n])
+
+    # Сенсоры группы — битовая маска (сенсоров единицы), затем категория со строкой
+    keep = np.argsort(representatives, kind="stable")
+    masks = np.bitwise_or.reduceat(np.left_shift(1, sensor[order]), starts)[keep]
+    unique_masks, mask_codes = np.unique(masks, return_inverse=True)
+    labels = [
+        SENSOR_SEPARATOR.join(name for bit, name in enumerate(sensor_names) if mask >> bit & 1)
+        for mask in unique_masks.tolist()
+    ]
+    result = fire_gdf.iloc[representatives[keep]].assign(
+        sensors=pd.Categorical.from_codes(mask_codes, labels),
+        detections=detections[keep].astype("int16"),
+    )
+    merged = n - len(result)
+    if merged:
+        logger.info(f"[DEDUP] Детекции разных сенсоров: {n} → {len(result)} наблюдений (слито {merged})")
+    return result
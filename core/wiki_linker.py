@@ -1,30 +1,56 @@
 import requests
 import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+from utils.files import atomic_write_json
+from utils.metrics import observe
+
+logger = logging.getLogger(__name__)
 
 CACHE_FILE = Path("data/wiki_cache.json")
 BASE_SEARCH_URL = "https://wiki.simargl-team.ru/public/index.php?search="
 BASE_ARTICLE_URL = "https://wiki.simargl-team.ru/index.php/"
 
+# Найденные ссылки хранятся бессрочно, «не найдено» — перепроверяется через NEGATIVE_TTL
+NEGATIVE_TTL = timedelta(days=7)
+MAX_WORKERS = 8
+REQUEST_TIMEOUT = 5
+
 # === Загрузка / сохранение кэша ===
 def load_cache():
-    if CACHE_FILE.exists():
-        return json.loads(CACHE_FILE.read_text())
-    return {}
+    """
+    Кэш вида {unique_id: {"url": str | None, "checked_at": iso}}.
+    Старый формат {unique_id: url | None} переводится на лету; None из него считается устаревшим.
+    """
+    if not CACHE_FILE.exists():
+        return {}
+    cache = json.loads(CACHE_FILE.read_text())
+    return {
+        uid: entry if isinstance(entry, dict) else {"url": entry, "checked_at": None}
+        for uid, entry in cache.items()
+    }
 
 def save_cache(cache):
-    CACHE_FILE.write_text(json.dumps(cache, ensure_ascii=False, indent=2))
-
-# === Основная функция ===
-def get_wiki_url(unique_id: str) -> str | None:
-    cache = load_cache()
-    if unique_id in cache:
-        return cache[unique_id]
+    atomic_write_json(CACHE_FILE, cache)
 
+# === Поиск статьи ===
+def search_wiki_url(session, unique_id: str) -> tuple[bool, str | None]:
+    """
+    Ищет статью торфяника. Возвращает (ответ получен, ссылка или None).
+    """
     try:
-        resp = requests.get(BASE_SEARCH_URL + unique_id, timeout=5)
+        started = time.perf_counter()
+        try:
+            resp = session.get(BASE_SEARCH_URL + unique_id, timeout=REQUEST_TIMEOUT)
+        finally:
+            observe("wiki", time.perf_counter() - started)
         if resp.status_code != 200:
-            return None
+            return False, None
 
         # Простая эвристика: ищем первую ссылку на статью
         for line in resp.text.splitlines():
@@ -33,16 +59,69 @@ def get_wiki_url(unique_id: str) -> str | None:
                 end = line.find("\"", start)
                 if start != -1 and end != -1:
                     link = line[start:end].replace("&amp;", "&")
-                    full_url = "https://wiki.simargl-team.ru" + link
-                    cache[unique_id] = full_url
-                    save_cache(cache)
-                    return full_url
+                    return True, "https://wiki.simargl-team.ru" + link
 
         # Если ничего не нашли
-        cache[unique_id] = None
-        save_cache(cache)
-        return None
+        return True, None
 
     except Exception as e:
-        print(f"[wiki_linker] Ошибка при получении wiki для {unique_id}: {e}")
-        return None
+        logger.warning(f"[wiki_linker] Ошибка при получении wiki для {unique_id}: {e}")
+        return False, None
+
+
+class WikiResolver:
+    """
+    Кэш ссылок на вики, загруженный один раз: недостающие id ищутся параллельно
+    через общий пул соединений, кэш записывается одним атомарным сохранением.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, negative_ttl: timedelta = NEGATIVE_TTL):
+        self.cache = load_cache()
+        self.max_workers = max_workers
+        self.negative_ttl = negative_ttl
+        self.dirty = False
+
+    def is_fresh(self, unique_id: str) -> bool:
+        entry = self.cache.get(unique_id)
+        if entry is None:
+            return False
+        if entry["url"] is not None:
+            return True
+        checked_at = entry.get("checked_at")
+        return bool(checked_at) and datetime.now() - datetime.fromisoformat(checked_at) < self.negative_ttl
+
+    def get(self, unique_id: str) -> str | None:
+        entry = self.cache.get(unique_id)
+        return entry["url"] if entry else None
+
+    def resolve_many(self, unique_ids) -> dict[str, str | None]:
+        unique_ids = list(dict.fromkeys(uid for uid in unique_ids if uid))
+        missing = [uid for uid in unique_ids if not self.is_fresh(uid)]
+
+        if missing:
+            logger.info(f"[wiki_linker] Поиск ссылок для {len(missing)} торфяников")
+            with requests.Session() as session:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount("https://", adapter)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    results = pool.map(lambda uid: search_wiki_url(session, uid), missing)
+                    for uid, (answered, url) in zip(missing, results):
+                        # Сетевые ошибки не кэшируем — попробуем в следующий раз
+                        if answered:
+                            self.cache[uid] = {"url": url, "checked_at": datetime.now().isoformat()}
+                            self.dirty = True
+
+        return {uid: self.get(uid) for uid in unique_ids}
+
+    def save(self):
+        if self.dirty:
+            save_cache(self.cache)
+            self.dirty = False
+
+
+# === Основная функция ===
+def get_wiki_url(unique_id: str) -> str | None:
+    resolver = WikiResolver()
+    url = resolver.resolve_many([unique_id]).get(unique_id)
+    resolver.save()
+    return url
@@ -2,52 +2,211 @@
 
 import argparse
 import asyncio
+from datetime import datetime, timedelta
 from pathlib import Path
 import json
 
 from utils.logger import setup_logger
-from tg.notifier import send_alert_messages
-from core.geo_downloader import download_firms_data, load_local_archives
-from core.geo_processor import load_polygons, find_matches_with_tolerance
+from tg.notifier import notify_admins, send_alert_messages
+from core.geo_downloader import download_firms_data, load_local_archives, replay_raw_data
+from core.geo_processor import PolygonIndexUnavailable, get_polygon_index, find_matches_with_tolerance
+from core.detection_filter import filter_detections
+from core.sensor_dedup import collapse_cross_sensor
+from core.detection_store import filter_new, mark_processed
 from core.alert_generator import generate_alerts
+from core.alert_snapshot import ALERTS_FILE, publish_snapshot
+from core.history import append_run
+from core.report import publish_report
 from core.notifier import format_alert_message
+from utils.files import atomic_write_json, exclusive_lock
+from utils.metrics import start_run, stage
+
+PIPELINE_LOCK = Path("data/pipeline.lock")
+# В режиме опроса алерты копятся до утренней рассылки; старше этого срока — отбрасываются
+ACCUMULATE_WINDOW = timedelta(hours=48)
 
 def print_available_fields(df, label):
     print(f"\n📋 Доступные поля в {label}:")
     for col in df.columns:
         print(f" - {col}")
 
-def run_main(source="online"):
-    setup_logger()
-
+def load_fire_points(source="online", replay_date=None, skip_unchanged=False):
     if source == "local":
-        fire_gdf = load_local_archives()
-    else:
-        fire_gdf = download_firms_data()
+        return load_local_archives()
+    if source == "replay":
+        return replay_raw_data(replay_date)
+    return download_firms_data(skip_unchanged=skip_unchanged)
+
+def merge_alerts(previous, alerts):
+    """
+    Добавляет алерты запуска к накопленным: обновлённое событие заменяет свою прежнюю версию,
+    события, молчащие дольше ACCUMULATE_WINDOW, отбрасываются.
+    """
+    if not alerts:
+        return list(previous)
+    merged = {alert["id"]: alert for alert in previous}
+    merged.update((alert["id"], alert) for alert in alerts)
+    time_format = "%Y-%m-%d %H:%M"
+    newest = max(datetime.strptime(alert["last_seen"], time_format) for alert in alerts)
+    horizon = (newest - ACCUMULATE_WINDOW).strftime(time_format)
+    kept = [alert for alert in merged.values() if alert.get("last_seen", "") >= horizon]
+    return sorted(kept, key=lambda alert: (alert["first_seen"], alert["id"]))
+
+def run_pipeline(source="online", replay_date=None, incremental=True, progress=None,
+                 accumulate=False, skip_unchanged=False):
+    """
+    Загрузка, сопоставление и формирование алертов без рассылки.
+    progress(text) получает сообщения о ходе анализа. Возвращает (число совпадений, алерты).
+    accumulate — дописать алерты к data/last_alerts.json, а не заменить его (частые запуски
+    режима опроса до утренней рассылки); skip_unchanged — не разбирать источники,
+    не изменившиеся с прошлой загрузки (ответ 304).
+    Время, строки и память каждого этапа пишутся в метрики запуска (utils/metrics.py).
+    Одновременно выполняется только один анализ на машине (cron, бот, планировщик):
+    пока идёт другой, запуск пропускается.
+    """
+    report = progress or (lambda text: None)
+    with exclusive_lock(PIPELINE_LOCK) as acquired:
+        if not acquired:
+            print("⏳ Анализ уже выполняется другим процессом — запуск пропущен.")
+            report("⏳ Анализ уже выполняется другим процессом — запуск пропущен.")
+            return 0, []
+        return _run_pipeline(source, replay_date, incremental, report, accumulate, skip_unchanged)
+
+def _run_pipeline(source, replay_date, incremental, report, accumulate=False, skip_unchanged=False):
+
+    report("🌐 Загрузка термоточек…")
+    with stage("download") as st:
+        fire_gdf = load_fire_points(source, replay_date, skip_unchanged)
+        st.rows_out = len(fire_gdf)
+    report(f"🔥 Получено точек: {len(fire_gdf)}")
+    # Детекции низкой достоверности не доходят до сопоставления (правила — в data/settings.json)
+    with stage("prefilter", rows_in=len(fire_gdf)) as st:
+        fire_gdf, removed = filter_detections(fire_gdf)
+        st.rows_out = len(fire_gdf)
+        st.extra.update(removed=removed)
+    if any(removed.values()):
+        report(f"🧹 После фильтра качества: {len(fire_gdf)}")
+    if incremental:
+        # Фиды за 24 часа перекрываются — сопоставляем только новые термоточки
+        with stage("filter_new", rows_in=len(fire_gdf)) as st:
+            fire_gdf = filter_new(fire_gdf)
+            st.rows_out = len(fire_gdf)
+        report(f"🆕 Новых точек: {len(fire_gdf)}")
+    if fire_gdf.empty:
+        # Частый случай режима опроса: фиды не обновились — полигоны и сопоставление не нужны
+        return 0, []
 
-    poly_gdf = load_polygons()
-    matched = find_matches_with_tolerance(fire_gdf, poly_gdf)
+    with stage("polygons") as st:
+        poly_index = get_polygon_index()
+        st.rows_out = len(poly_index.polygons) if poly_index is not None else 0
+    if poly_index is None:
+        # Без полигонов «совпадений нет» — не результат: термоточки не отмечаются обработанными
+        # и будут сопоставлены следующим запуском
+        message = "❌ Полигоны не загружены — сопоставление пропущено, термоточки не отмечены обработанными."
+        print(message)
+        report(message)
+        raise PolygonIndexUnavailable(message)
+    with stage("match", rows_in=len(fire_gdf)) as st:
+        matched = find_matches_with_tolerance(fire_gdf, poly_index)
+        st.rows_out = len(matched)
+    report(f"🔍 Найдено совпадений: {len(matched)}")
     if matched.empty:
         print("❗ Совпадений не найдено.")
-        return
+        if incremental:
+            with stage("mark_processed", rows_in=len(fire_gdf)):
+                mark_processed(fire_gdf)
+        return 0, []
+
+    # Один пожар, увиденный несколькими сенсорами, — одно наблюдение со списком сенсоров.
+    # Сливаются уже совпавшие детекции одного торфяника: каждая сопоставлена со своей
+    # погрешностью, поэтому слияние не теряет совпадений
+    with stage("dedup", rows_in=len(matched)) as st:
+        observations = collapse_cross_sensor(matched, by="unique_id")
+        st.rows_out = len(observations)
+    if len(observations) < len(matched):
+        report(f"🛰️ Наблюдений после слияния сенсоров: {len(observations)}")
 
-    alerts = generate_alerts(matched)
-    Path("data/last_alerts.json").write_text(json.dumps(alerts, ensure_ascii=False, indent=2))
-    asyncio.run(send_alert_messages(alerts))
+    with stage("alerts", rows_in=len(observations)) as st:
+        alerts = generate_alerts(observations)
+        st.rows_out = len(alerts)
+    with stage("publish", rows_in=len(alerts)) as st:
+        published = alerts
+        if accumulate and ALERTS_FILE.exists():
+            published = merge_alerts(json.loads(ALERTS_FILE.read_text()), alerts)
+        # Атомарно: рассылка в 8:00 может читать файл из другого процесса
+        atomic_write_json(ALERTS_FILE, published)
+        publish_snapshot(published)
+        st.rows_out = len(published)
+    try:
+        with stage("report", rows_in=len(observations)):
+            publish_report(observations, alerts, accumulate=accumulate)
+    except Exception as e:
+        print(f"⚠️ Не удалось сформировать отчёт: {e}")
+    try:
+        # История хранит каждую совпавшую детекцию, как и backfill.py
+        with stage("history", rows_in=len(matched)):
+            append_run(matched, alerts)
+    except Exception as e:
+        # История — вспомогательные данные, её сбой не должен срывать рассылку
+        print(f"⚠️ Не удалось сохранить историю: {e}")
+    if incremental:
+        with stage("mark_processed", rows_in=len(fire_gdf)):
+            mark_processed(fire_gdf)
+    report(f"🚨 Сформировано алертов: {len(alerts)}")
+    return len(matched), alerts
 
-def debug_main(source="online"):
+def run_main(source="online", replay_date=None, incremental=True, digest=False,
+             metrics_textfile=None, profile_path=None):
+    """
+    Ночной запуск: анализ и рассылка. По окончании пишет JSON-отчёт с метриками этапов,
+    при metrics_textfile — файл для Prometheus, при profile_path — дамп cProfile.
+    """
+    setup_logger()
+    metrics = start_run()
+
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        count, alerts = run_pipeline(source, replay_date, incremental)
+        if alerts:
+            asyncio.run(send_alert_messages(alerts, digest=digest))
+    except PolygonIndexUnavailable as e:
+        asyncio.run(notify_admins(f"⚠️ Ночной анализ не выполнен: {e}"))
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"📈 Профиль сохранён в {profile_path} (просмотр: python -m pstats {profile_path})")
+        metrics.write_report()
+        if metrics_textfile:
+            metrics.write_prometheus(metrics_textfile)
+    return count
+
+def debug_main(source="online", replay_date=None, digest=False):
     setup_logger()
 
     if source == "local":
         print("📁 Загрузка термоточек из локального архива...")
-        fire_gdf = load_local_archives()
+    elif source == "replay":
+        print("🔁 Повтор обработки сохранённых сырых данных...")
     else:
         print("🌐 Загрузка термоточек с FIRMS (онлайн)...")
-        fire_gdf = download_firms_data()
+    fire_gdf = load_fire_points(source, replay_date)
 
     print(f"🔥 Получено точек: {len(fire_gdf)}")
+    fire_gdf, removed = filter_detections(fire_gdf)
+    print(f"🧹 После фильтра качества: {len(fire_gdf)} ({', '.join(f'{k}: −{v}' for k, v in removed.items())})")
     print("\n📦 Загрузка полигонов...")
-    poly_gdf = load_polygons()
+    poly_index = get_polygon_index()
+    if poly_index is None:
+        print("❗ Полигоны не загружены.")
+        return
+    poly_gdf = poly_index.polygons
     print(f"🗺️ Загружено полигонов: {len(poly_gdf)}")
 
     print("\n📌 Пример геометрии первой термоточки:")
@@ -57,32 +216,42 @@ def debug_main(source="online"):
     print(poly_gdf.iloc[0].geometry.centroid)
 
     print("\n🔍 Анализ пересечений с учётом погрешности...")
-    matched = find_matches_with_tolerance(fire_gdf, poly_gdf)
+    matched = find_matches_with_tolerance(fire_gdf, poly_index)
     print(f"✅ Найдено совпадений: {len(matched)}")
 
     if matched.empty:
         print("\n❗ Совпадений не найдено.")
         return
+    matched = collapse_cross_sensor(matched, by="unique_id")
+    print(f"🛰️ Наблюдений после слияния сенсоров: {len(matched)}")
 
-    alerts = generate_alerts(matched)
+    # Отладочный прогон не меняет сохранённые события пожаров
+    alerts = generate_alerts(matched, persist_events=False)
     print(f"\n🚨 Найдено АЛЕРТов: {len(alerts)}")
     for alert in alerts[:5]:
         print("\n📤 Пример сообщения:")
         print(format_alert_message(alert))
 
-    Path("data/last_alerts.json").write_text(json.dumps(alerts, ensure_ascii=False, indent=2))
+    atomic_write_json(ALERTS_FILE, alerts)
+    publish_snapshot(alerts)
     print(f"💾 Сохранено {len(alerts)} алертов.")
-    asyncio.run(send_alert_messages(alerts))
+    asyncio.run(send_alert_messages(alerts, digest=digest))
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Анализ термоточек")
-    parser.add_argument("--source", choices=["online", "local"], default="online", help="Источник термоточек")
+    parser.add_argument("--source", choices=["online", "local", "replay"], default="online", help="Источник термоточек")
+    parser.add_argument("--replay-date", help="Дата сохранённых сырых данных для --source replay (YYYY-MM-DD)")
+    parser.add_argument("--full", action="store_true", help="Обработать все термоточки, а не только новые")
+    parser.add_argument("--digest", action="store_true", help="Отправлять сводку по регионам вместо сообщения на каждый алерт")
     parser.add_argument("--debug", action="store_true", help="Выводить отладочные сообщения")
+    parser.add_argument("--metrics-textfile", help="Файл метрик для textfile collector Prometheus (*.prom)")
+    parser.add_argument("--profile", metavar="PATH", help="Сохранить профиль cProfile запуска в PATH")
     return parser.parse_args()
 
 if __name__ == "__main__":
     args = parse_args()
     if args.debug:
-        debug_main(source=args.source)
+        debug_main(source=args.source, replay_date=args.replay_date, digest=args.digest)
     else:
-        run_main(source=args.source)
+        run_main(source=args.source, replay_date=args.replay_date, incremental=not args.full, digest=args.digest,
+                 metrics_textfile=args.metrics_textfile, profile_path=args.profile)
@@ -0,0 +1,29 @@
+# prewarm_wiki.py
+#
+# Заполняет кэш ссылок на вики для всех полигонов торфяников,
+# чтобы ночной запуск не ходил в вики за каждым новым торфяником.
+
+import argparse
+import logging
+
+from core.alert_generator import unique_id_to_str
+from core.geo_processor import load_polygon_index
+from core.wiki_linker import WikiResolver, MAX_WORKERS
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+parser = argparse.ArgumentParser(description="Прогрев кэша ссылок на вики")
+parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Число параллельных запросов")
+args = parser.parse_args()
+
+poly_index = load_polygon_index()
+if poly_index is None:
+    print("❗ Полигоны не загружены.")
+else:
+    unique_ids = [uid for uid in map(unique_id_to_str, poly_index.polygons["unique_id"].dropna()) if uid]
+    resolver = WikiResolver(max_workers=args.workers)
+    urls = resolver.resolve_many(unique_ids)
+    resolver.save()
+
+    found = sum(1 for url in urls.values() if url)
+    print(f"📚 Торфяников: {len(urls)}, найдено статей: {found}, без статьи: {len(urls) - found}")
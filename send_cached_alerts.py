@@ -1,5 +1,6 @@
 # send_cached_alerts.py
 
+import argparse
 import json
 from pathlib import Path
 import os
@@ -10,11 +11,15 @@ from tg.notifier import send_alert_messages
 import asyncio
 ALERTS_FILE = Path("data/last_alerts.json")
 
+parser = argparse.ArgumentParser(description="Отправка сохранённых алертов")
+parser.add_argument("--digest", action="store_true", help="Отправлять сводку по регионам вместо сообщения на каждый алерт")
+args = parser.parse_args()
+
 if ALERTS_FILE.exists():
     alerts = json.loads(ALERTS_FILE.read_text())
     if alerts:
         print(f"📤 Отправка {len(alerts)} алертов подписчикам...")
-        asyncio.run(send_alert_messages(alerts))
+        asyncio.run(send_alert_messages(alerts, digest=args.digest))
     else:
         print("⚠️ Нет алертов для отправки.")
 else:
@@ -0,0 +1,14 @@
+# tests/conftest.py
+#
+# config.py с ADMIN_IDS не хранится в репозитории — для тестов подставляем свой,
+# если рабочего нет.
+
+import importlib.util
+import sys
+import types
+
+if importlib.util.find_spec("config") is None:
+    config = types.ModuleType("config")
+    config.ADMIN_IDS = []
+    config.send_if_no_region = True
+    sys.modules["config"] = config
@@ -0,0 +1,108 @@
+# tests/test_delivery.py
+#
+# DeliveryScheduler против поддельного бота: RetryAfter, повторы при TimedOut,
+# отказ без повторов при Forbidden, порядок сообщений в чате, on_sent только для доставленных.
+#
+# Запуск из корня проекта:  python -m pytest -q tests
+
+import asyncio
+import time
+
+import pytest
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+import tg.delivery as delivery
+from tg.delivery import DeliveryScheduler, OutgoingMessage
+
+
+class FakeBot:
+    """
+    send_message записывает отправленное; errors — {(chat_id, text): [исключения по попыткам]}.
+    """
+
+    def __init__(self, errors: dict | None = None):
+        self.errors = errors or {}
+        self.calls = []
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append((time.monotonic(), chat_id, text))
+        pending = self.errors.get((chat_id, text))
+        if pending:
+            raise pending.pop(0)
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(delivery, "BACKOFF_BASE", 0)
+
+
+def deliver(bot, messages, **kwargs):
+    scheduler = DeliveryScheduler(bot, rate=1000, burst=1000, per_chat_interval=0, **kwargs)
+    return asyncio.run(scheduler.run(messages))
+
+
+def test_retry_after_pauses_all_chats():
+    bot = FakeBot({(1, "a"): [RetryAfter(0.2)]})
+    stats = deliver(bot, [OutgoingMessage(1, "a"), OutgoingMessage(2, "b")], max_concurrent_chats=1)
+
+    assert bot.sent == [(1, "a"), (2, "b")]
+    assert stats.flood_waits == 1 and stats.retries == 1
+    first_try, retried, other_chat = bot.calls
+    assert retried[0] - first_try[0] >= 0.2
+    assert other_chat[0] - first_try[0] >= 0.2
+
+
+def test_timed_out_is_retried():
+    bot = FakeBot({(1, "a"): [TimedOut(), TimedOut()]})
+    stats = deliver(bot, [OutgoingMessage(1, "a")])
+
+    assert bot.sent == [(1, "a")]
+    assert len(bot.calls) == 3
+    assert stats.sent == 1 and stats.retries == 2 and stats.failed == 0
+
+
+def test_timed_out_gives_up_after_max_attempts():
+    bot = FakeBot({(1, "a"): [TimedOut() for _ in range(delivery.MAX_ATTEMPTS)]})
+    stats = deliver(bot, [OutgoingMessage(1, "a")])
+
+    assert len(bot.calls) == delivery.MAX_ATTEMPTS
+    assert stats.failed == 1
+
+
+def test_forbidden_is_not_retried():
+    bot = FakeBot({(1, "a"): [Forbidden("bot was blocked by the user")]})
+    stats = deliver(bot, [OutgoingMessage(1, "a"), OutgoingMessage(1, "b")])
+
+    assert [call[1:] for call in bot.calls] == [(1, "a"), (1, "b")]
+    assert stats.failed == 1 and stats.retries == 0 and stats.sent == 1
+
+
+def test_order_within_chat_is_kept():
+    messages = [OutgoingMessage(chat, f"{chat}-{i}") for i in range(5) for chat in (1, 2, 3)]
+    bot = FakeBot({(2, "2-1"): [TimedOut()]})
+    deliver(bot, messages)
+
+    for chat in (1, 2, 3):
+        assert [text for chat_id, text in bot.sent if chat_id == chat] == [f"{chat}-{i}" for i in range(5)]
+
+
+def test_per_chat_interval():
+    bot = FakeBot()
+    scheduler = DeliveryScheduler(bot, rate=1000, burst=1000, per_chat_interval=0.1)
+    asyncio.run(scheduler.run([OutgoingMessage(1, "a"), OutgoingMessage(1, "b")]))
+
+    assert bot.calls[1][0] - bot.calls[0][0] >= 0.1
+
+
+def test_on_sent_only_for_delivered():
+    delivered = []
+    bot = FakeBot({(1, "bad"): [Forbidden("chat not found")], (2, "slow"): [TimedOut()]})
+    messages = [
+        OutgoingMessage(chat, text, on_sent=lambda chat=chat, text=text: delivered.append((chat, text)))
+        for chat, text in [(1, "bad"), (1, "ok"), (2, "slow")]
+    ]
+    deliver(bot, messages)
+
+    assert sorted(delivered) == [(1, "ok"), (2, "slow")]
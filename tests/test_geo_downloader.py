@@ -0,0 +1,131 @@
+# tests/test_geo_downloader.py
+#
+# Условный GET FIRMS против локального HTTP-сервера aiohttp: ETag/304, повторы при 5xx,
+# отказ без повторов при 4xx, сохранение сырых CSV и state.json.
+#
+# Запуск из корня проекта:  python -m pytest -q tests
+
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import core.geo_downloader as downloader
+
+CSV = (
+    "latitude,longitude,brightness,scan,track,acq_date,acq_time,satellite,instrument,confidence,version,bright_t31,frp,daynight\n"
+    "55.1,37.2,310.5,1.0,1.0,2025-04-03,830,T,MODIS,71,6.1NRT,290.1,12.3,D\n"
+)
+
+
+class FakeFirms:
+    """
+    Сервер с заранее заданными ответами по источникам: {имя: [(status, headers, body), …]}.
+    Последний ответ повторяется, если запросов больше; заголовки запросов запоминаются.
+    """
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+        self.requests = {name: [] for name in responses}
+        self.server = None
+
+    async def handle(self, request):
+        name = request.match_info["name"]
+        self.requests[name].append(dict(request.headers))
+        script = self.responses[name]
+        status, headers, body = script[min(len(self.requests[name]), len(script)) - 1]
+        return web.Response(status=status, headers=headers, body=body)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/{name}", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.server.close()
+
+    @property
+    def sources(self) -> dict:
+        return {name: str(self.server.make_url(f"/{name}")) for name in self.responses}
+
+
+@pytest.fixture(autouse=True)
+def raw_dir(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    monkeypatch.setattr(downloader, "RAW_DIR", raw)
+    monkeypatch.setattr(downloader, "RAW_STATE_FILE", raw / "state.json")
+    monkeypatch.setattr(downloader, "BACKOFF_BASE", 0)
+    return raw
+
+
+def fetch(responses: dict):
+    async def run():
+        async with FakeFirms(responses) as firms:
+            return await downloader.fetch_all_sources(firms.sources), firms
+    return asyncio.run(run())
+
+
+def test_new_csv_is_stored_with_validators(raw_dir):
+    (result,), firms = fetch({"modis": [(200, {"ETag": '"v1"', "Last-Modified": "Thu, 03 Apr 2025 09:00:00 GMT"}, CSV)]})
+
+    assert result.status == "new"
+    assert open(result.path).read() == CSV
+    state = json.loads((raw_dir / "state.json").read_text())
+    assert state["modis"]["etag"] == '"v1"'
+    assert state["modis"]["last_modified"] == "Thu, 03 Apr 2025 09:00:00 GMT"
+    assert state["modis"]["path"] == result.path
+    assert "If-None-Match" not in firms.requests["modis"][0]
+    assert not list(raw_dir.rglob("*.tmp"))
+
+
+def test_not_modified_reuses_stored_copy(raw_dir):
+    (first,), _ = fetch({"modis": [(200, {"ETag": '"v1"'}, CSV)]})
+    (second,), firms = fetch({"modis": [(304, {}, b"")]})
+
+    assert second.status == "not_modified"
+    assert second.path == first.path
+    assert firms.requests["modis"][0]["If-None-Match"] == '"v1"'
+    assert len(list((raw_dir / "modis").glob("*.csv"))) == 1
+
+
+def test_skip_unchanged_drops_not_modified_sources(monkeypatch):
+    fetch({"modis": [(200, {"ETag": '"v1"'}, CSV)], "viirs_suomi": [(200, {"ETag": '"s1"'}, CSV)]})
+    responses = {"modis": [(304, {}, b"")], "viirs_suomi": [(304, {}, b"")]}
+
+    original = downloader.fetch_all_sources
+
+    async def fetch_local():
+        async with FakeFirms(responses) as firms:
+            return await original(firms.sources)
+
+    monkeypatch.setattr(downloader, "fetch_all_sources", fetch_local)
+    assert downloader.download_firms_data(skip_unchanged=True).empty
+    assert len(downloader.download_firms_data(skip_unchanged=False)) == 2
+
+
+def test_server_error_is_retried(raw_dir):
+    (result,), firms = fetch({"modis": [(503, {}, b""), (200, {"ETag": '"v2"'}, CSV)]})
+
+    assert result.status == "new"
+    assert len(firms.requests["modis"]) == 2
+    assert json.loads((raw_dir / "state.json").read_text())["modis"]["etag"] == '"v2"'
+
+
+def test_client_error_is_not_retried(raw_dir):
+    (result,), firms = fetch({"modis": [(404, {}, b"")]})
+
+    assert result.status == "failed"
+    assert result.error.status == 404
+    assert len(firms.requests["modis"]) == 1
+    assert not (raw_dir / "modis").exists()
+
+
+def test_retries_are_bounded():
+    (result,), firms = fetch({"modis": [(503, {}, b"")]})
+
+    assert result.status == "failed"
+    assert len(firms.requests["modis"]) == downloader.RETRIES
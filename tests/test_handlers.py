@@ -0,0 +1,110 @@
+# tests/test_handlers.py
+#
+# Меню выбора регионов при перезагрузке data/settings.json, пока меню открыто:
+# нажатие переключает тот регион, что был на кнопке; выключенные регионы
+# не переключаются и не сохраняются.
+#
+# Запуск из корня проекта:  python -m pytest -q tests
+
+import asyncio
+
+import pytest
+
+import tg.handlers as handlers
+from utils.settings import Settings
+
+REGIONS = ["Владимирская область", "Ивановская область", "Калужская область"]
+
+
+class FakeStore:
+    def __init__(self):
+        self.regions = {}
+
+    def get_regions(self, user_id):
+        return list(self.regions.get(user_id, []))
+
+    def set_regions(self, user_id, regions):
+        self.regions[user_id] = list(regions)
+
+
+class FakeQuery:
+    def __init__(self, data):
+        self.data = data
+        self.from_user = type("User", (), {"id": 1})()
+        self.markups = []
+        self.texts = []
+
+    async def answer(self):
+        pass
+
+    async def edit_message_reply_markup(self, reply_markup):
+        self.markups.append(reply_markup)
+
+    async def edit_message_text(self, text):
+        self.texts.append(text)
+
+
+class FakeContext:
+    def __init__(self, temp):
+        self.user_data = {"temp_regions": temp}
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    current = {"settings": Settings({"regions": REGIONS})}
+    store = FakeStore()
+    monkeypatch.setattr(handlers, "get_settings", lambda: current["settings"])
+    monkeypatch.setattr(handlers, "get_store", lambda: store)
+
+    async def start(update, context):
+        pass
+
+    monkeypatch.setattr(handlers, "start", start)
+
+    def disable(region):
+        current["settings"] = Settings({"regions": REGIONS, "regions_enabled": {region: False}})
+
+    return disable, store
+
+
+def tap(data, temp):
+    query = FakeQuery(data)
+    context = FakeContext(temp)
+    update = type("Update", (), {"callback_query": query})()
+    asyncio.run(handlers.region_callback(update, context))
+    return query, context
+
+
+def callback_data(markup) -> dict:
+    return {row[0].callback_data: row[0].text for row in markup.inline_keyboard}
+
+
+def test_toggle_survives_reload_that_shifts_regions(settings):
+    disable, _ = settings
+    buttons = callback_data(handlers.region_buttons([]))
+    tapped = next(data for data, text in buttons.items() if REGIONS[1] in text)
+
+    # Пока меню открыто, выключают регион перед нажатым
+    disable(REGIONS[0])
+    _, context = tap(tapped, [])
+
+    assert context.user_data["temp_regions"] == [REGIONS[1]]
+
+
+def test_disabled_region_is_not_toggled(settings):
+    disable, _ = settings
+    tapped = next(data for data, text in callback_data(handlers.region_buttons([])).items() if REGIONS[0] in text)
+
+    disable(REGIONS[0])
+    query, context = tap(tapped, [])
+
+    assert context.user_data["temp_regions"] == []
+    assert all(REGIONS[0] not in text for text in callback_data(query.markups[-1]).values())
+
+
+def test_save_drops_disabled_regions(settings):
+    disable, store = settings
+    disable(REGIONS[2])
+    tap("region_save", [REGIONS[0], REGIONS[2]])
+
+    assert store.regions[1] == [REGIONS[0]]
@@ -0,0 +1,28 @@
+# tests/test_notifier.py
+#
+# Сводка по регионам: сообщения не длиннее лимита Telegram, раздел региона, перенесённый
+# в следующее сообщение, получает заголовок продолжения из шаблона; название экранируется.
+#
+# Запуск из корня проекта:  python -m pytest -q tests
+
+from tg.delivery_log import alert_key
+from tg.notifier import MESSAGE_LIMIT, format_digest_messages
+
+
+def make_alerts(count: int, region: str) -> list[dict]:
+    return [{"id": f"{i}-202504030830", "region": region} for i in range(count)]
+
+
+def test_long_region_continues_with_template_header():
+    region = "Тверская область <Север>"
+    alerts = make_alerts(40, region)
+    texts = {alert_key(alert["id"]): "🔥 " + "x" * 300 for alert in alerts}
+
+    chunks = format_digest_messages(alerts, texts)
+
+    assert len(chunks) > 1
+    assert all(len(text.encode("utf-16-le")) // 2 <= MESSAGE_LIMIT for text, _ in chunks)
+    assert sum(len(chunk_alerts) for _, chunk_alerts in chunks) == len(alerts)
+    assert chunks[0][0].startswith("📍 <b>Тверская область &lt;Север&gt;</b> — торфяников с термоточками: 40")
+    for text, _ in chunks[1:]:
+        assert text.startswith("📍 <b>Тверская область &lt;Север&gt;</b> (продолжение)\n\n")
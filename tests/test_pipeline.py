@@ -0,0 +1,54 @@
+# tests/test_pipeline.py
+#
+# Пайплайн без полигонов: сопоставление не выполняется, термоточки не отмечаются
+# обработанными (иначе они потерялись бы навсегда), сбой доходит до администратора.
+#
+# Запуск из корня проекта:  python -m pytest -q tests
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+
+import main
+from core.geo_processor import PolygonIndexUnavailable
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    points = pd.DataFrame({
+        "latitude": [54.52634], "longitude": [32.446949], "acq_date": ["2025-04-03"], "acq_time": [830],
+        "confidence": ["n"], "frp": [12.3], "source": ["viirs_suomi"],
+    })
+    fire_gdf = gpd.GeoDataFrame(points, geometry=gpd.points_from_xy(points.longitude, points.latitude), crs="EPSG:4326")
+    marked = []
+    monkeypatch.setattr(main, "PIPELINE_LOCK", tmp_path / "pipeline.lock")
+    monkeypatch.setattr(main, "load_fire_points", lambda *args: fire_gdf)
+    monkeypatch.setattr(main, "filter_new", lambda gdf: gdf)
+    monkeypatch.setattr(main, "mark_processed", marked.append)
+    monkeypatch.setattr(main, "get_polygon_index", lambda: None)
+    return marked
+
+
+def test_missing_polygons_keep_detections_unprocessed(pipeline):
+    progress = []
+    with pytest.raises(PolygonIndexUnavailable):
+        main.run_pipeline("online", progress=progress.append)
+
+    assert pipeline == []
+    assert any("Полигоны не загружены" in text for text in progress)
+
+
+def test_missing_polygons_notify_admins(pipeline, monkeypatch):
+    notified = []
+
+    async def notify_admins(text, app_bot=None):
+        notified.append(text)
+
+    monkeypatch.setattr(main, "notify_admins", notify_admins)
+    monkeypatch.setattr(main, "setup_logger", lambda: None)
+    monkeypatch.setattr(main, "start_run", lambda: type("Run", (), {"write_report": lambda self: None})())
+    with pytest.raises(PolygonIndexUnavailable):
+        main.run_main("online")
+
+    assert pipeline == []
+    assert len(notified) == 1
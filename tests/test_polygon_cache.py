@@ -0,0 +1,75 @@
+# tests/test_polygon_cache.py
+#
+# Кэш полигонов: пересборка только при изменении содержимого GeoJSON; файл, который лишь
+# тронули (новый mtime, то же содержимое), хэшируется один раз, а не при каждой загрузке.
+#
+# Запуск из корня проекта:  python -m pytest -q tests
+
+import json
+import os
+
+import pytest
+
+import core.geo_processor as geo_processor
+
+GEOJSON = {
+    "type": "FeatureCollection",
+    "features": [{
+        "type": "Feature",
+        "properties": {"region": "Смоленская область", "district": "ПОЧИНКОВСКИЙ", "unique_id": 772.0},
+        "geometry": {"type": "Polygon", "coordinates": [[
+            [3610000.0, 7270000.0], [3612000.0, 7270000.0], [3612000.0, 7272000.0],
+            [3610000.0, 7272000.0], [3610000.0, 7270000.0],
+        ]]},
+    }],
+}
+
+
+@pytest.fixture
+def polygons(tmp_path, monkeypatch):
+    source = tmp_path / "polygons.geojson"
+    source.write_text(json.dumps(GEOJSON))
+    monkeypatch.setattr(geo_processor, "POLYGON_PATH", str(source))
+    monkeypatch.setattr(geo_processor, "POLYGON_CACHE_PATH", tmp_path / "cache" / "polygons.parquet")
+    monkeypatch.setattr(geo_processor, "POLYGON_CACHE_META", tmp_path / "cache" / "polygons.meta.json")
+    return source
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    calls = []
+    original = geo_processor._file_hash
+
+    def counting_hash(path):
+        calls.append(path)
+        return original(path)
+
+    monkeypatch.setattr(geo_processor, "_file_hash", counting_hash)
+    return calls
+
+
+def test_touched_source_is_hashed_once(polygons, hashes):
+    assert len(geo_processor.load_polygon_index()) == 1
+    hashes.clear()
+
+    stat = polygons.stat()
+    os.utime(polygons, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert len(geo_processor.load_polygon_index()) == 1
+    assert len(hashes) == 1
+
+    meta = json.loads(geo_processor.POLYGON_CACHE_META.read_text())
+    assert meta["source_state"]["mtime_ns"] == polygons.stat().st_mtime_ns
+    assert len(geo_processor.load_polygon_index()) == 1
+    assert len(hashes) == 1
+
+
+def test_changed_source_rebuilds_cache(polygons):
+    geo_processor.load_polygon_index()
+    old_hash = json.loads(geo_processor.POLYGON_CACHE_META.read_text())["source_hash"]
+
+    changed = json.loads(json.dumps(GEOJSON))
+    changed["features"].append({**changed["features"][0], "properties": {**changed["features"][0]["properties"], "unique_id": 773.0}})
+    polygons.write_text(json.dumps(changed))
+
+    assert len(geo_processor.load_polygon_index()) == 2
+    assert json.loads(geo_processor.POLYGON_CACHE_META.read_text())["source_hash"] != old_hash
@@ -0,0 +1,38 @@
+# tests/test_templates.py
+#
+# Шаблоны сообщений: проверка полей по схеме при загрузке, экранирование HTML,
+# кэш с учётом схемы и режима экранирования.
+#
+# Запуск из корня проекта:  python -m pytest -q tests
+
+import pytest
+
+from utils.templates import TemplateError, load_template
+
+
+@pytest.fixture
+def templates(tmp_path):
+    (tmp_path / "alert.txt").write_text("🔥 <b>{title}</b>: {count} точек\n", encoding="utf-8")
+    return tmp_path
+
+
+def test_fields_are_checked_against_schema(templates):
+    with pytest.raises(TemplateError, match="count"):
+        load_template("alert", ("title",), directory=templates)
+
+
+def test_cache_respects_schema(templates):
+    template = load_template("alert", ("title", "count"), directory=templates)
+    assert load_template("alert", ("count", "title"), directory=templates) is template
+    # Тот же файл, но схема без поля — ошибка, а не ранее скомпилированный объект
+    with pytest.raises(TemplateError):
+        load_template("alert", ("title",), directory=templates)
+
+
+def test_cache_respects_escape_html(templates):
+    escaped = load_template("alert", ("title", "count"), directory=templates)
+    raw = load_template("alert", ("title", "count"), escape_html=False, directory=templates)
+
+    values = {"title": "A & B", "count": 3}
+    assert escaped.render(values) == "🔥 <b>A &amp; B</b>: 3 точек"
+    assert raw.render(values) == "🔥 <b>A & B</b>: 3 точек"
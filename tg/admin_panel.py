@@ -0,0 +1,96 @@
+# tg/admin_panel.py
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+# Один рабочий поток: тяжёлый анализ не блокирует event loop бота,
+# а полигоны и кэши остаются прогретыми между запусками
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+_analysis_lock = asyncio.Lock()
+
+
+def poll_interval_from_env() -> timedelta | None:
+    """
+    Интервал режима опроса (POLL_INTERVAL_MINUTES); None — опрос выключен.
+    При включённом опросе любой анализ дописывает алерты к накопленным за день, а не затирает их.
+    """
+    minutes = float(os.getenv("POLL_INTERVAL_MINUTES", "0") or 0)
+    return timedelta(minutes=minutes) if minutes > 0 else None
+
+
+def is_analysis_running() -> bool:
+    return _analysis_lock.locked()
+
+
+@asynccontextmanager
+async def exclusive_analysis(wait: bool = False):
+    """
+    Общая блокировка /analyze и заданий планировщика. Внутри блока — True, если она получена;
+    при wait=False и занятой блокировке — сразу False.
+    """
+    if not wait and _analysis_lock.locked():
+        yield False
+        return
+    async with _analysis_lock:
+        yield True
+
+
+async def run_in_worker(func):
+    """
+    Выполняет func в потоке анализа: event loop бота не блокируется,
+    а прогретые полигоны и кэши переиспользуются.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_executor, func)
+
+
+async def run_analysis_job(bot, chat_id: int, source: str = "online", digest: bool = False):
+    """
+    Фоновый анализ по команде /analyze: пайплайн в рабочем потоке,
+    ход выполнения и итог — сообщениями администратору.
+    Повторный вызов во время работы не запускает второй анализ.
+    """
+    async with exclusive_analysis(wait=False) as acquired:
+        if not acquired:
+            await bot.send_message(chat_id, "⏳ Анализ уже выполняется — дождитесь результата.")
+            return None
+
+        # Пайплайн тянет geopandas, shapely и pandas — загружаем их только при первом анализе
+        from main import run_pipeline
+        from tg.notifier import send_alert_messages
+        from utils.metrics import start_run
+
+        loop = asyncio.get_running_loop()
+
+        def progress(text: str):
+            # Вызывается из рабочего потока — отправку планируем в loop бота
+            asyncio.run_coroutine_threadsafe(bot.send_message(chat_id, text), loop)
+
+        try:
+            # Свои метрики на каждый запуск: иначе этапы копятся в общем RunMetrics процесса бота
+            metrics = start_run()
+            # Ручной запуск не затирает алерты, накопленные опросами для утренней рассылки
+            accumulate = poll_interval_from_env() is not None
+            count, alerts = await run_in_worker(
+                lambda: run_pipeline(source, progress=progress, accumulate=accumulate))
+            if alerts:
+                await bot.send_message(chat_id, f"📤 Рассылка {len(alerts)} алертов…")
+                await send_alert_messages(alerts, digest=digest, app_bot=bot)
+            metrics.write_report()
+            await bot.send_message(chat_id, f"✅ Анализ завершён: найдено {count} совпадений.")
+            if count:
+                from core.report import get_report_cache
+
+                text = get_report_cache().text_for(admin=True)
+                if text:
+                    await bot.send_message(chat_id, text)
+            return count
+        except Exception as e:
+            logger.exception("[ADMIN] Ошибка фонового анализа")
+            await bot.send_message(chat_id, f"⚠️ Анализ завершился с ошибкой: {e}")
+            return None
@@ -0,0 +1,164 @@
+# tg/delivery.py
+
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from utils.metrics import observe
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram Bot API: ~30 сообщений/с на бота и ~1 сообщение/с в один чат
+GLOBAL_RATE = 25
+GLOBAL_BURST = 25
+PER_CHAT_INTERVAL = 1.0
+MAX_CONCURRENT_CHATS = 32
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0
+
+
+class TokenBucket:
+    """
+    Глобальный ограничитель частоты: rate токенов в секунду, запас до capacity.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """
+        Останавливает выдачу токенов всем отправителям (после RetryAfter).
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OutgoingMessage:
+    """
+    Одно сообщение рассылки; on_sent вызывается после успешной доставки.
+    """
+
+    def __init__(self, chat_id: int, text: str, on_sent=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.on_sent = on_sent
+
+
+class DeliveryStats:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.flood_waits = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"отправлено {self.sent}, ошибок {self.failed}, повторов {self.retries}, "
+            f"RetryAfter {self.flood_waits}, {self.elapsed:.1f} с, {self.rate:.1f} сообщений/с"
+        )
+
+
+class DeliveryScheduler:
+    """
+    Параллельная рассылка в пределах лимитов Telegram: общий token bucket на бота,
+    не чаще одного сообщения в PER_CHAT_INTERVAL в каждый чат, порядок внутри чата сохраняется.
+    """
+
+    def __init__(self, bot, rate: float = GLOBAL_RATE, burst: float = GLOBAL_BURST,
+                 per_chat_interval: float = PER_CHAT_INTERVAL, max_concurrent_chats: int = MAX_CONCURRENT_CHATS,
+                 **send_kwargs):
+        self.bot = bot
+        self.bucket = TokenBucket(rate, burst)
+        self.per_chat_interval = per_chat_interval
+        self.chats = asyncio.Semaphore(max_concurrent_chats)
+        self.send_kwargs = send_kwargs
+        self.stats = DeliveryStats()
+
+    async def send(self, message: OutgoingMessage) -> bool:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await self.bucket.acquire()
+            try:
+                started = time.perf_counter()
+                try:
+                    await self.bot.send_message(chat_id=message.chat_id, text=message.text, **self.send_kwargs)
+                finally:
+                    observe("telegram", time.perf_counter() - started)
+                self.stats.sent += 1
+                logger.info(f"[TG] ✅ Сообщение отправлено → {message.chat_id}")
+                if message.on_sent:
+                    message.on_sent()
+                return True
+
+            except RetryAfter as e:
+                self.stats.flood_waits += 1
+                logger.warning(f"[TG] ⏳ RetryAfter {e.retry_after} с → {message.chat_id}")
+                self.bucket.pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except (Forbidden, BadRequest) as e:
+                # Бот заблокирован, чат удалён или сообщение некорректно — повтор не поможет
+                logger.error(f"[TG] ❌ Ошибка при отправке → {message.chat_id}: {e}")
+                break
+            except NetworkError as e:
+                if attempt == MAX_ATTEMPTS:
+                    logger.error(f"[TG] ❌ Ошибка при отправке → {message.chat_id}: {e}")
+                    break
+                delay = BACKOFF_BASE * 2 ** (attempt - 1)
+                logger.warning(f"[TG] ⚠️ {e} → {message.chat_id}, повтор через {delay:.0f} с")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                logger.error(f"[TG] ❌ Ошибка при отправке → {message.chat_id}: {e}")
+                break
+            self.stats.retries += 1
+
+        self.stats.failed += 1
+        return False
+
+    async def _send_chat(self, messages: list[OutgoingMessage]):
+        async with self.chats:
+            for i, message in enumerate(messages):
+                if i:
+                    await asyncio.sleep(self.per_chat_interval)
+                await self.send(message)
+
+    async def run(self, messages: list[OutgoingMessage]) -> DeliveryStats:
+        by_chat = {}
+        for message in messages:
+            by_chat.setdefault(message.chat_id, []).append(message)
+
+        self.stats = DeliveryStats()
+        await asyncio.gather(*(self._send_chat(chat_messages) for chat_messages in by_chat.values()))
+        self.stats.finished = time.monotonic()
+
+        logger.info(f"[TG] 📊 Рассылка: {self.stats.summary()}")
+        return self.stats
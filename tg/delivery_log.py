@@ -0,0 +1,126 @@
+# tg/delivery_log.py
+
+import json
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+LEDGER_FILE = Path("data/delivery.sqlite")
+LEGACY_LOG_FILE = Path("data/sent_log.json")
+
+# Через сколько дней запись о доставке забывается и алерт может прийти снова
+RETENTION_DAYS = 90
+FLUSH_EVERY = 50
+
+
+def alert_key(alert_id) -> str:
+    """
+    Единый строковый ключ алерта: 465.0 из JSON и 465 из pandas дают "465".
+    """
+    if isinstance(alert_id, float) and alert_id.is_integer():
+        alert_id = int(alert_id)
+    return str(alert_id)
+
+
+class DeliveryLog:
+    """
+    Журнал доставок в SQLite с уникальным ключом (alert_id, user_id).
+    Записи копятся в буфере и пишутся пачками.
+    """
+
+    def __init__(self, path: Path = LEDGER_FILE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deliveries (
+                alert_id TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                region TEXT,
+                title TEXT,
+                date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                PRIMARY KEY (alert_id, user_id)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS deliveries_date ON deliveries (date)")
+        self.conn.commit()
+        self.pending = []
+        self.migrate_legacy_log()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def migrate_legacy_log(self, legacy_file: Path = LEGACY_LOG_FILE):
+        """
+        Однократный перенос data/sent_log.json; исходный файл переименовывается.
+        """
+        if not legacy_file.exists():
+            return
+
+        entries = json.loads(legacy_file.read_text())
+        rows = [
+            (alert_key(e["alert_id"]), int(e["user_id"]), e.get("region"), e.get("title"),
+             e.get("date") or datetime.now().strftime("%Y-%m-%d"), e.get("status", "sent"))
+            for e in entries
+        ]
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO deliveries VALUES (?, ?, ?, ?, ?, ?)", rows)
+        legacy_file.rename(legacy_file.with_name(legacy_file.name + ".migrated"))
+        logger.info(f"[TG] Журнал доставок перенесён из {legacy_file}: {len(rows)} записей")
+
+    def sent_users(self, alert_ids) -> dict[str, set[int]]:
+        """
+        Кому уже доставлены алерты: {alert_key: {user_id, ...}} одним запросом на пачку.
+        """
+        keys = list({alert_key(a) for a in alert_ids})
+        delivered = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT alert_id, user_id FROM deliveries WHERE alert_id IN ({placeholders})", chunk
+            )
+            for alert_id, user_id in rows:
+                delivered.setdefault(alert_id, set()).add(user_id)
+        return delivered
+
+    def was_sent(self, alert_id, user_id: int) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM deliveries WHERE alert_id = ? AND user_id = ?", (alert_key(alert_id), user_id)
+        ).fetchone()
+        return row is not None
+
+    def record(self, alert: dict, user_id: int, status: str = "sent"):
+        self.pending.append((
+            alert_key(alert["id"]), user_id, alert.get("region"), alert.get("title"),
+            datetime.now().strftime("%Y-%m-%d"), status,
+        ))
+        if len(self.pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO deliveries VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+        self.pending = []
+
+    def prune(self, days: int = RETENTION_DAYS) -> int:
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM deliveries WHERE date < ?", (cutoff,)).rowcount
+        if removed:
+            logger.info(f"[TG] Из журнала доставок удалено {removed} записей старше {days} дней")
+        return removed
+
+    def close(self):
+        self.flush()
+        self.conn.close()
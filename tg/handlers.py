@@ -1,51 +1,20 @@
-import json
-from pathlib import Path
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from config import ADMIN_IDS, send_if_no_region
-from main import run_main
+from tg.admin_panel import run_analysis_job, is_analysis_running
+from tg.subscriptions import get_store
+from core.alert_snapshot import get_alert_snapshot
+from core.report import get_report_cache
 from utils.logger import notify_admin_of_error
-
-USERS_FILE = Path("data/users.json")
-REGIONS_FILE = Path("data/user_regions.json")
-ALERTS_FILE = Path("data/last_alerts.json")
-
-AVAILABLE_REGIONS = [
-    "Владимирская область", "Ивановская область", "Калужская область",
-    "Костромская область", "Московская область", "Рязанская область",
-    "Смоленская область", "Тверская область", "Ярославская область",
-]
-
-def load_users():
-    return json.loads(USERS_FILE.read_text()) if USERS_FILE.exists() else []
-
-def save_user(user_id: int):
-    users = load_users()
-    if user_id not in users:
-        users.append(user_id)
-        USERS_FILE.write_text(json.dumps(users))
-
-def remove_user(user_id: int):
-    users = load_users()
-    if user_id in users:
-        users.remove(user_id)
-        USERS_FILE.write_text(json.dumps(users))
-
-def load_user_regions():
-    return json.loads(REGIONS_FILE.read_text()) if REGIONS_FILE.exists() else {}
-
-def save_user_regions(data):
-    REGIONS_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2))
-
-def load_last_alerts():
-    return json.loads(ALERTS_FILE.read_text()) if ALERTS_FILE.exists() else []
+from utils.settings import get_settings
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
-        save_user(user_id)
-        user_regions = load_user_regions().get(str(user_id), [])
+        store = get_store()
+        store.add_user(user_id)
+        user_regions = store.get_regions(user_id)
         regions_info = f"\n📍 Выбранные регионы: {', '.join(user_regions)}" if user_regions else ""
 
         text = (
@@ -78,14 +47,13 @@ async def my_regions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         msg = update.callback_query.message
         user_id = update.effective_user.id
-        user_regions = load_user_regions()
-        selected = user_regions.get(str(user_id))
+        selected = get_store().get_regions(user_id)
 
         if selected:
             text = "📍 *Ваши регионы:*\n" + "\n".join(f"• {r}" for r in selected)
         else:
             text = "📍 *Вы не выбрали регионы.*\nВы будете получать оповещения по всем регионам:\n" + \
-                   "\n".join(f"• {r}" for r in AVAILABLE_REGIONS)
+                   "\n".join(f"• {r}" for r in get_settings().enabled_regions)
 
         await msg.reply_text(text, parse_mode="Markdown")
     except Exception as e:
@@ -126,27 +94,33 @@ async def contacts(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
-        remove_user(user_id)
-        regions = load_user_regions()
-        if str(user_id) in regions:
-            del regions[str(user_id)]
-            save_user_regions(regions)
+        get_store().remove_user(user_id)
         msg = update.message or update.callback_query.message
         await msg.reply_text("❎ Вы отписались от рассылки. Вернуться — /start")
     except Exception as e:
         await notify_admin_of_error(f"Ошибка в /unsubscribe: {e}", context)
 
+def region_buttons(selected) -> InlineKeyboardMarkup:
+    """
+    Меню выбора регионов из data/settings.json (выключенные не предлагаются).
+    В callback_data — позиция региона в полном списке settings.regions: она не сдвигается,
+    когда регионы включают и выключают, пока меню открыто.
+    """
+    settings = get_settings()
+    enabled = set(settings.enabled_regions)
+    buttons = [
+        [InlineKeyboardButton(f"{'✅' if r in selected else '⬜️'} {r}", callback_data=f"region_{i}")]
+        for i, r in enumerate(settings.regions) if r in enabled
+    ]
+    buttons.append([InlineKeyboardButton("💾 Сохранить", callback_data="region_save")])
+    return InlineKeyboardMarkup(buttons)
+
+
 async def regions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
-        current = load_user_regions().get(str(user_id), [])
-
-        buttons = [
-            [InlineKeyboardButton(f"{'✅' if r in current else '⬜️'} {r}", callback_data=f"region_{i}")]
-            for i, r in enumerate(AVAILABLE_REGIONS)
-        ]
-        buttons.append([InlineKeyboardButton("💾 Сохранить", callback_data="region_save")])
-        reply_markup = InlineKeyboardMarkup(buttons)
+        current = get_store().get_regions(user_id)
+        reply_markup = region_buttons(current)
 
         if update.callback_query:
             try:
@@ -175,35 +149,32 @@ async def region_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Открытие выбора регионов
         if data == "region_open":
-            full = load_user_regions()
-            context.user_data["temp_regions"] = full.get(str(user_id), []).copy()
+            context.user_data["temp_regions"] = get_store().get_regions(user_id)
             return await regions(update, context)
 
         # Временный список выбранных
         temp = context.user_data.get("temp_regions", [])
 
         if data.startswith("region_") and data != "region_save":
+            settings = get_settings()
             index = int(data.split("_")[1])
-            region = AVAILABLE_REGIONS[index]
+            region = settings.regions[index] if index < len(settings.regions) else None
+            if region not in settings.enabled_regions:
+                # Регион выключили или убрали, пока было открыто меню, — показываем актуальное
+                return await query.edit_message_reply_markup(reply_markup=region_buttons(temp))
             if region in temp:
                 temp.remove(region)
             else:
                 temp.append(region)
             context.user_data["temp_regions"] = temp
-
-            buttons = [
-                [InlineKeyboardButton(f"{'✅' if r in temp else '⬜️'} {r}", callback_data=f"region_{i}")]
-                for i, r in enumerate(AVAILABLE_REGIONS)
-            ]
-            buttons.append([InlineKeyboardButton("💾 Сохранить", callback_data="region_save")])
-            await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(buttons))
+            await query.edit_message_reply_markup(reply_markup=region_buttons(temp))
             return
 
         elif data == "region_save":
-            user_regions = load_user_regions()
-            selected = context.user_data.get("temp_regions", [])
-            user_regions[str(user_id)] = selected
-            save_user_regions(user_regions)
+            # Сохраняются только регионы, включённые на момент сохранения
+            enabled = get_settings().enabled_regions
+            selected = [r for r in context.user_data.get("temp_regions", []) if r in enabled]
+            get_store().set_regions(user_id, selected)
 
             if selected:
                 await query.edit_message_text(f"✅ Вы подписаны на термоточки из: {', '.join(selected)}")
@@ -218,43 +189,70 @@ async def region_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def my_alerts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
-        alerts = load_last_alerts()
-        regions = load_user_regions().get(str(user_id), [])
-        results = {}
+        regions = get_store().get_regions(user_id)
+        # Тексты по регионам подготовлены пайплайном — только выбираем нужные
+        messages = get_alert_snapshot().messages_for(regions)
 
-        for a in alerts:
-            if not regions or a["region"] in regions:
-                results.setdefault(a["region"], []).append(a)
-
-        if not results:
+        if not messages:
             msg = update.message or update.callback_query.message
             await msg.reply_text("🔥 Вчера термоточек в ваших регионах не было.")
             return
 
-        for region, region_alerts in results.items():
-            text = f"📍 *{region}* — {len(region_alerts)} точек\n"
-            for a in region_alerts:
-                text += f"- {a.get('date', 'нет даты')} {a['lat']:.4f}, {a['lon']:.4f}\n"
+        for text in messages:
             await update.effective_message.reply_text(text, parse_mode="Markdown")
     except Exception as e:
         await notify_admin_of_error(f"Ошибка в /my_alerts: {e}", context)
 
+async def report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        # Текст для админов и для каждого набора регионов рендерится один раз на отчёт
+        text = get_report_cache().text_for(get_store().get_regions(user_id), admin=user_id in ADMIN_IDS)
+        await update.message.reply_text(text or "📊 Отчёт ещё не сформирован.")
+    except Exception as e:
+        await notify_admin_of_error(f"Ошибка в /report: {e}", context)
+
+async def instant(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        store = get_store()
+        if not store.is_subscribed(user_id):
+            await update.message.reply_text("Сначала подпишитесь — /start")
+            return
+        enabled = not store.is_instant(user_id)
+        store.set_instant(user_id, enabled)
+        if enabled:
+            text = (
+                "⚡️ Срочные оповещения включены.\n"
+                "Свежие термоточки в ваших регионах будут приходить сразу после обновления данных "
+                "спутников, остальные — как обычно, в 8 утра.\n"
+                "Выключить — /instant"
+            )
+        else:
+            text = "🔕 Срочные оповещения выключены. Термоточки будут приходить в 8 утра."
+        await update.message.reply_text(text)
+    except Exception as e:
+        await notify_admin_of_error(f"Ошибка в /instant: {e}", context)
+
 async def analyze(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
         if user_id not in ADMIN_IDS:
             await update.message.reply_text("⛔️ Недостаточно прав")
             return
+        if is_analysis_running():
+            await update.message.reply_text("⏳ Анализ уже выполняется — дождитесь результата.")
+            return
         await update.message.reply_text("📡 Анализ начат…")
-        count = await run_main()
-        await update.message.reply_text(f"✅ Анализ завершён: найдено {count} совпадений.")
+        # Не ждём завершения: обработчик освобождается, итог придёт отдельным сообщением
+        context.application.create_task(run_analysis_job(context.bot, update.effective_chat.id))
     except Exception as e:
         await notify_admin_of_error(f"Ошибка в /analyze: {e}", context)
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
-        regions = load_user_regions().get(str(user_id), [])
+        regions = get_store().get_regions(user_id)
         regions_info = f"\n📍 Выбранные регионы: {', '.join(regions)}" if regions else ""
 
         base_cmds = (
@@ -262,6 +260,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "/unsubscribe — отписаться\n"
             "/regions — выбрать регионы\n"
             "/my_alerts — вчерашние термоточки\n"
+            "/instant — срочные оповещения (вкл/выкл)\n"
+            "/report — ежедневный отчёт\n"
             "/about — как работает бот\n"
             "/contacts — контакты команды\n"
             "/help — справка"
@@ -3,99 +3,172 @@
 import logging
 from telegram import Bot
 from telegram.constants import ParseMode
-from core.notifier import format_alert_message
+from core.notifier import format_alert_messages
+from tg.delivery_log import DeliveryLog, alert_key
+from tg.delivery import DeliveryScheduler, OutgoingMessage
+from tg.subscriptions import get_store
+from utils.metrics import gauge, stage
+from utils.templates import load_template
 from config import ADMIN_IDS
 import asyncio
-import json
-from pathlib import Path
-from datetime import datetime
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
-bot = Bot(token=os.getenv("TELEGRAM_TOKEN"))
+_bot = None
 
-USERS_FILE = Path("data/users.json")
-LOG_FILE = Path("data/sent_log.json")
-REGIONS_FILE = Path("data/user_regions.json")
+# Максимальная длина текста сообщения Telegram
+MESSAGE_LIMIT = 4096
 
+# Заголовок раздела региона в сводке и его продолжения в следующем сообщении
+REGION_HEADER = load_template("notify", ("region", "count"))
+REGION_CONTINUED_HEADER = load_template("notify_continued", ("region",))
 
-def load_user_ids():
-    if USERS_FILE.exists():
-        return json.loads(USERS_FILE.read_text())
-    return []
 
+def get_bot() -> Bot:
+    """
+    Бот для рассылок вне приложения (cron, планировщик-демон); создаётся при первом обращении,
+    а не при импорте модуля.
+    """
+    global _bot
+    if _bot is None:
+        _bot = Bot(token=os.getenv("TELEGRAM_TOKEN"))
+    return _bot
 
-def load_sent_log():
-    if LOG_FILE.exists():
-        return json.loads(LOG_FILE.read_text())
-    return []
 
+def _tg_len(text: str) -> int:
+    # Telegram считает длину в UTF-16: эмодзи занимают две позиции
+    return len(text.encode("utf-16-le")) // 2
 
-def save_sent_log(log: list):
-    LOG_FILE.write_text(json.dumps(log, ensure_ascii=False, indent=2))
 
+def format_digest_messages(alerts: list[dict], texts: dict | None = None) -> list[tuple[str, list[dict]]]:
+    """
+    Сводка алертов пользователя: разделы по регионам, упакованные в минимальное число
+    сообщений не длиннее MESSAGE_LIMIT. Возвращает пары (текст, алерты в этом сообщении).
+    texts — готовые тексты алертов по alert_key (общие для всей рассылки).
+    """
+    if texts is None:
+        texts = dict(zip((alert_key(alert["id"]) for alert in alerts), format_alert_messages(alerts)))
 
-def was_alert_sent(alert: dict, user_id: int, sent_log: list) -> bool:
-    return any(
-        entry["alert_id"] == alert["id"] and entry["user_id"] == user_id
-        for entry in sent_log
-    )
-
-
-def log_sent_alert(alert: dict, user_id: int, sent_log: list):
-    entry = {
-        "user_id": user_id,
-        "alert_id": alert["id"],
-        "region": alert["region"],
-        "title": alert["title"],
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "status": "sent"
-    }
-    sent_log.append(entry)
-
-
-def load_user_regions():
-    if REGIONS_FILE.exists():
-        return json.loads(REGIONS_FILE.read_text())
-    return {}
-
-
-async def send_alert_messages(alerts: list[dict]):
+    by_region = {}
+    for alert in alerts:
+        by_region.setdefault(alert["region"], []).append(alert)
+
+    chunks = []
+    text, chunk_alerts = "", []
+
+    def flush():
+        nonlocal text, chunk_alerts
+        if chunk_alerts:
+            chunks.append((text.rstrip(), chunk_alerts))
+        text, chunk_alerts = "", []
+
+    for region, region_alerts in by_region.items():
+        section = REGION_HEADER.render({"region": region, "count": len(region_alerts)}) + "\n\n"
+        section_has_alerts = False
+        for alert in region_alerts:
+            block = texts[alert_key(alert["id"])] + "\n\n"
+            if _tg_len(text + section + block) > MESSAGE_LIMIT:
+                # Не помещается: закрываем сообщение, раздел региона продолжается в следующем
+                if section_has_alerts:
+                    text += section
+                    section = REGION_CONTINUED_HEADER.render({"region": region}) + "\n\n"
+                flush()
+            section += block
+            section_has_alerts = True
+            chunk_alerts.append(alert)
+        text += section
+
+    flush()
+    return chunks
+
+
+async def send_alert_messages(alerts: list[dict], digest: bool = False, app_bot: Bot | None = None,
+                              instant_only: bool = False):
+    """
+    Рассылает алерты подписчикам: по одному сообщению на алерт
+    или, при digest=True, сводкой по регионам.
+    app_bot — бот запущенного приложения (его event loop); по умолчанию get_bot().
+    instant_only — только подписчикам со срочными оповещениями (режим опроса);
+    остальные получат эти алерты утренней рассылкой.
+    """
     if not alerts:
         logger.info("[TG] Нет АЛЕРТов для отправки.")
         return
 
-    user_ids = load_user_ids()
-    recipients = list(set(user_ids + ADMIN_IDS))
-    sent_log = load_sent_log()
-    user_regions = load_user_regions()
-
-    for alert in alerts:
-        message = format_alert_message(alert)
-
-        for user_id in recipients:
-            # 🔍 Фильтрация по интересующим регионам
-            regions = user_regions.get(str(user_id), [])
-            if regions and alert["region"] not in regions:
-                continue
-
-            if was_alert_sent(alert, user_id, sent_log):
-                logger.info(f"[TG] ⚠️ Уже отправлялся → {user_id}, alert {alert['id']}")
-                continue
-
-            try:
-                await bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode=ParseMode.HTML,
-                    disable_web_page_preview=True
-                )
-                logger.info(f"[TG] ✅ Сообщение отправлено → {user_id}")
-                log_sent_alert(alert, user_id, sent_log)
-            except Exception as e:
-                logger.error(f"[TG] ❌ Ошибка при отправке → {user_id}: {e}")
-
-    save_sent_log(sent_log)
+    store = get_store()
+    # Получатели по регионам — один раз на регион, а не перебор всех пользователей на каждый алерт
+    region_recipients = {}
+
+    with DeliveryLog() as sent_log:
+        with stage("deliver.ledger", rows_in=len(alerts)) as st:
+            sent_log.prune()
+            delivered = sent_log.sent_users(alert["id"] for alert in alerts)
+            st.rows_out = len(delivered)
+
+        with stage("deliver.render", rows_in=len(alerts)) as st:
+            # Недоставленные алерты каждого пользователя в исходном порядке
+            pending = {}
+            needed = []
+            for alert in alerts:
+                already_sent = delivered.get(alert_key(alert["id"]), set())
+                region = alert["region"]
+                if region not in region_recipients:
+                    region_recipients[region] = sorted(store.recipients_for_region(
+                        region, extra=ADMIN_IDS, instant_only=instant_only))
+
+                recipients = [user_id for user_id in region_recipients[region] if user_id not in already_sent]
+                for user_id in already_sent.intersection(region_recipients[region]):
+                    logger.info(f"[TG] ⚠️ Уже отправлялся → {user_id}, alert {alert['id']}")
+                if recipients:
+                    needed.append(alert)
+                for user_id in recipients:
+                    pending.setdefault(user_id, []).append(alert)
+
+            # Текст каждого алерта рендерится один раз на всю рассылку
+            texts = dict(zip((alert_key(alert["id"]) for alert in needed), format_alert_messages(needed)))
+
+            def mark_sent(user_id, sent_alerts):
+                return lambda: [sent_log.record(alert, user_id) for alert in sent_alerts]
+
+            messages = []
+            if digest:
+                # У пользователей с одинаковыми регионами одинаковые сводки — собираем один раз
+                digests = {}
+                for user_id, user_alerts in pending.items():
+                    key = tuple(alert_key(alert["id"]) for alert in user_alerts)
+                    if key not in digests:
+                        digests[key] = format_digest_messages(user_alerts, texts)
+                    for text, chunk_alerts in digests[key]:
+                        messages.append(OutgoingMessage(user_id, text, on_sent=mark_sent(user_id, chunk_alerts)))
+            else:
+                for user_id, user_alerts in pending.items():
+                    for alert in user_alerts:
+                        key = alert_key(alert["id"])
+                        messages.append(OutgoingMessage(user_id, texts[key], on_sent=mark_sent(user_id, [alert])))
+            st.rows_out = len(messages)
+
+        scheduler = DeliveryScheduler(app_bot or get_bot(), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+        with stage("deliver.send", rows_in=len(messages)) as st:
+            stats = await scheduler.run(messages)
+            st.rows_out = stats.sent
+            st.extra.update(failed=stats.failed, retries=stats.retries, flood_waits=stats.flood_waits,
+                            messages_per_s=round(stats.rate, 2))
+        gauge("delivery_messages_per_second", round(stats.rate, 2))
+        gauge("delivery_messages_sent", stats.sent)
+        gauge("delivery_messages_failed", stats.failed)
+        return stats
+
+
+async def notify_admins(text: str, app_bot: Bot | None = None):
+    """
+    Служебное сообщение администраторам (сбой анализа и т. п.); ошибки отправки только логируются.
+    """
+    bot = app_bot or get_bot()
+    for admin_id in ADMIN_IDS:
+        try:
+            await bot.send_message(admin_id, text)
+        except Exception as e:
+            logger.error(f"[TG] ❌ Не удалось уведомить администратора {admin_id}: {e}")
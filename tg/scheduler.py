@@ -0,0 +1,266 @@
+# tg/scheduler.py
+#
+# Планировщик заданий внутри процесса бота вместо cron-запусков main.py,
+# send_cached_alerts.py и clean.py: полигоны и кэши загружаются один раз и остаются
+# прогретыми, анализ и рассылка не пересекаются (общая блокировка с /analyze
+# и межпроцессная блокировка пайплайна в main.run_pipeline).
+#
+# Включается переменной окружения SCHEDULER_ENABLED=1 (в .env). Время — локальное время
+# сервера, как в crontab:
+#   SCHEDULE_ANALYSIS=00:30         анализ (можно несколько через запятую: 00:30,06:00)
+#   SCHEDULE_DELIVERY=08:00         рассылка последних алертов
+#   SCHEDULE_CLEANUP=03:30          очистка устаревших файлов (clean.py)
+#   SCHEDULE_SOURCE=online          источник термоточек для анализа
+#   SCHEDULE_DIGEST=0               рассылать сводкой по регионам
+#   POLL_INTERVAL_MINUTES=0         режим опроса: каждые N минут забирать новые термоточки
+#                                   и сразу слать свежие алерты подписчикам со срочными
+#                                   оповещениями (/instant); 0 — выключен
+#
+# Отдельным демоном без бота:  python -m tg.scheduler
+#
+# Пайплайн (main, geopandas, pandas) импортируется внутри заданий: бот не платит
+# за GIS-модули при запуске, их загружает прогрев или первый анализ.
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, time, timedelta
+
+from dotenv import load_dotenv
+
+import clean
+from core.alert_snapshot import ALERTS_FILE, get_alert_snapshot
+from tg.admin_panel import exclusive_analysis, poll_interval_from_env, run_in_worker
+from tg.notifier import get_bot, notify_admins, send_alert_messages
+from utils.metrics import start_run
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYSIS_TIMES = "00:30"
+DEFAULT_DELIVERY_TIMES = "08:00"
+DEFAULT_CLEANUP_TIMES = "03:30"
+
+# Срочными считаются события с термоточкой не старше этого срока (время съёмки, UTC):
+# запоздавшие строки фидов уходят только в утреннюю рассылку
+URGENT_MAX_AGE = timedelta(hours=6)
+
+
+def parse_times(value: str) -> list[time]:
+    """
+    "00:30, 06:00" → [time(0, 30), time(6, 0)]
+    """
+    return sorted(datetime.strptime(part.strip(), "%H:%M").time() for part in value.split(",") if part.strip())
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+class DailyJob:
+    """
+    Задание, выполняемое каждый день в заданное время.
+    """
+
+    def __init__(self, name: str, times: list[time], func):
+        self.name = name
+        self.times = times
+        self.func = func
+        self.last_started = None
+        self.last_finished = None
+        self.last_error = None
+
+    def next_run(self, now: datetime) -> datetime:
+        today = [datetime.combine(now.date(), t) for t in self.times]
+        upcoming = [moment for moment in today if moment > now]
+        if upcoming:
+            return upcoming[0]
+        return today[0] + timedelta(days=1)
+
+
+class IntervalJob(DailyJob):
+    """
+    Задание, повторяемое через interval после окончания предыдущего запуска.
+    """
+
+    def __init__(self, name: str, interval: timedelta, func):
+        super().__init__(name, [], func)
+        self.interval = interval
+
+    def next_run(self, now: datetime) -> datetime:
+        return (self.last_finished or now) + self.interval
+
+
+def urgent_alerts(alerts: list[dict], now: datetime | None = None) -> list[dict]:
+    """
+    Алерты, которые нужно отправить сразу: последняя термоточка события свежее URGENT_MAX_AGE.
+    """
+    horizon = ((now or datetime.utcnow()) - URGENT_MAX_AGE).strftime("%Y-%m-%d %H:%M")
+    return [alert for alert in alerts if alert["last_seen"] >= horizon]
+
+
+class Scheduler:
+    """
+    Запускает задания в event loop бота. Каждое задание — отдельная задача asyncio,
+    поэтому долгий анализ не задерживает рассылку или очистку. Пропущенные запуски
+    (бот был остановлен) не догоняются — задание ждёт следующего времени.
+    """
+
+    def __init__(self, bot, source: str = "online", digest: bool = False,
+                 analysis_times=None, delivery_times=None, cleanup_times=None, poll_interval=None):
+        self.bot = bot
+        self.source = source
+        self.digest = digest
+        self.poll_interval = poll_interval
+        self.jobs = [
+            DailyJob("analysis", analysis_times or parse_times(DEFAULT_ANALYSIS_TIMES), self.analysis),
+            DailyJob("delivery", delivery_times or parse_times(DEFAULT_DELIVERY_TIMES), self.delivery),
+            DailyJob("cleanup", cleanup_times or parse_times(DEFAULT_CLEANUP_TIMES), self.cleanup),
+        ]
+        if poll_interval:
+            self.jobs.append(IntervalJob("poll", poll_interval, self.poll))
+        self.tasks = []
+        self.warm_up_task = None
+
+    @classmethod
+    def from_env(cls, bot) -> "Scheduler":
+        return cls(
+            bot,
+            source=os.getenv("SCHEDULE_SOURCE", "online"),
+            digest=_env_flag("SCHEDULE_DIGEST"),
+            analysis_times=parse_times(os.getenv("SCHEDULE_ANALYSIS", DEFAULT_ANALYSIS_TIMES)),
+            delivery_times=parse_times(os.getenv("SCHEDULE_DELIVERY", DEFAULT_DELIVERY_TIMES)),
+            cleanup_times=parse_times(os.getenv("SCHEDULE_CLEANUP", DEFAULT_CLEANUP_TIMES)),
+            poll_interval=poll_interval_from_env(),
+        )
+
+    # === Задания ===
+    async def warm_up(self):
+        """
+        Индекс полигонов и снимок алертов загружаются заранее, а не в момент первого анализа.
+        """
+        from core.geo_processor import get_polygon_index
+
+        index = await run_in_worker(get_polygon_index)
+        get_alert_snapshot().refresh()
+        logger.info(f"[SCHEDULER] 🔥 Прогрев: {len(index) if index is not None else 0} полигонов в памяти")
+
+    async def analysis(self):
+        async with exclusive_analysis(wait=False) as acquired:
+            if not acquired:
+                logger.warning("[SCHEDULER] ⏳ Анализ уже выполняется — плановый запуск пропущен")
+                return
+            from main import run_pipeline
+
+            metrics = start_run()
+            # При включённом опросе файл алертов копит найденное за день — не затираем его
+            count, alerts = await run_in_worker(
+                lambda: run_pipeline(self.source, accumulate=bool(self.poll_interval)))
+            metrics.write_report()
+            logger.info(f"[SCHEDULER] 📡 Анализ: {count} совпадений, {len(alerts)} алертов")
+
+    async def poll(self):
+        """
+        Опрос источников: неизменившиеся фиды стоят одного условного запроса (304),
+        сопоставляются только новые строки. Свежие алерты сразу уходят подписчикам
+        со срочными оповещениями, все — копятся для утренней рассылки.
+        """
+        async with exclusive_analysis(wait=False) as acquired:
+            if not acquired:
+                logger.info("[SCHEDULER] ⏳ Идёт анализ — опрос пропущен")
+                return
+            from main import run_pipeline
+
+            metrics = start_run()
+            count, alerts = await run_in_worker(
+                lambda: run_pipeline(self.source, accumulate=True, skip_unchanged=True))
+            urgent = urgent_alerts(alerts)
+            if urgent:
+                await send_alert_messages(urgent, app_bot=self.bot, instant_only=True)
+            if count:
+                # Пустые опросы не затирают отчёт содержательного запуска
+                metrics.write_report()
+            logger.info(f"[SCHEDULER] 🛰 Опрос: {count} совпадений, {len(alerts)} алертов, срочных {len(urgent)}")
+
+    async def delivery(self):
+        # Идущий анализ дописывает алерты — рассылка ждёт его окончания
+        async with exclusive_analysis(wait=True):
+            if not ALERTS_FILE.exists():
+                logger.warning(f"[SCHEDULER] Нет файла {ALERTS_FILE} — рассылать нечего")
+                return
+            alerts = json.loads(ALERTS_FILE.read_text())
+            metrics = start_run()
+            # Уже доставленные алерты отсеиваются журналом доставки
+            await send_alert_messages(alerts, digest=self.digest, app_bot=self.bot)
+            metrics.write_report()
+
+    async def cleanup(self):
+        await run_in_worker(clean.main)
+
+    # === Цикл ===
+    async def _run_job(self, job: DailyJob):
+        job.last_started = datetime.now()
+        log = logger.debug if isinstance(job, IntervalJob) else logger.info
+        log(f"[SCHEDULER] ▶️ {job.name}")
+        try:
+            await job.func()
+            job.last_error = None
+        except Exception as e:
+            logger.exception(f"[SCHEDULER] ❌ Ошибка задания {job.name}")
+            # Об ошибке сообщаем один раз, а не каждым опросом, пока она повторяется
+            if str(e) != job.last_error:
+                await notify_admins(f"⚠️ Задание {job.name} завершилось с ошибкой: {e}", app_bot=self.bot)
+            job.last_error = str(e)
+        job.last_finished = datetime.now()
+        log(f"[SCHEDULER] ⏹ {job.name}: {(job.last_finished - job.last_started).total_seconds():.1f} с")
+
+    async def _job_loop(self, job: DailyJob):
+        while True:
+            now = datetime.now()
+            moment = job.next_run(now)
+            if not isinstance(job, IntervalJob):
+                logger.info(f"[SCHEDULER] ⏰ {job.name}: следующий запуск {moment:%Y-%m-%d %H:%M}")
+            # Спим частями: после перевода часов или засыпания машины время пересчитывается
+            while (remaining := (moment - datetime.now()).total_seconds()) > 0:
+                await asyncio.sleep(min(remaining, 600))
+            await self._run_job(job)
+
+    def start(self):
+        """
+        Запускает задания в текущем event loop (вызывать из работающего loop).
+        """
+        loop = asyncio.get_running_loop()
+        self.tasks = [loop.create_task(self._job_loop(job), name=f"scheduler-{job.name}") for job in self.jobs]
+        self.warm_up_task = loop.create_task(self._run_job(DailyJob("warm_up", [], self.warm_up)))
+
+    async def stop(self):
+        tasks = self.tasks + [self.warm_up_task] if self.warm_up_task else self.tasks
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks = []
+        self.warm_up_task = None
+
+
+def scheduler_enabled() -> bool:
+    return _env_flag("SCHEDULER_ENABLED")
+
+
+async def run_daemon():
+    """
+    Планировщик без приёма команд: только плановые анализ, рассылка и очистка.
+    """
+    bot = get_bot()
+    async with bot:
+        scheduler = Scheduler.from_env(bot)
+        scheduler.start()
+        await asyncio.gather(*scheduler.tasks)
+
+
+if __name__ == "__main__":
+    from utils.logger import setup_logger
+
+    setup_logger()
+    asyncio.run(run_daemon())
@@ -0,0 +1,187 @@
+# tg/subscriptions.py
+
+import atexit
+import json
+import logging
+import threading
+from pathlib import Path
+
+from utils.files import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+USERS_FILE = Path("data/users.json")
+REGIONS_FILE = Path("data/user_regions.json")
+# Подписчики, включившие срочные оповещения (режим опроса в реальном времени)
+INSTANT_FILE = Path("data/instant_users.json")
+
+# Изменения копятся и пишутся на диск одним сохранением через FLUSH_DELAY секунд
+FLUSH_DELAY = 1.0
+
+
+def _mtime(path: Path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class SubscriptionStore:
+    """
+    Подписчики и их регионы в памяти с обратным индексом регион → пользователи.
+    Запись на диск атомарная и отложенная (write-behind); изменения файлов
+    другим процессом подхватываются по mtime.
+    """
+
+    def __init__(self, users_file: Path = USERS_FILE, regions_file: Path = REGIONS_FILE,
+                 instant_file: Path = INSTANT_FILE):
+        self.users_file = users_file
+        self.regions_file = regions_file
+        self.instant_file = instant_file
+        self.lock = threading.RLock()
+        self.timer = None
+        self.dirty_users = False
+        self.dirty_regions = False
+        self.dirty_instant = False
+        self.load()
+
+    def _files(self):
+        return self.users_file, self.regions_file, self.instant_file
+
+    @property
+    def _dirty(self) -> bool:
+        return self.dirty_users or self.dirty_regions or self.dirty_instant
+
+    # === Загрузка ===
+    def load(self):
+        with self.lock:
+            self.users = json.loads(self.users_file.read_text()) if self.users_file.exists() else []
+            self.user_set = set(self.users)
+            regions = json.loads(self.regions_file.read_text()) if self.regions_file.exists() else {}
+            self.user_regions = {str(uid): list(selected) for uid, selected in regions.items()}
+            self.instant = set(json.loads(self.instant_file.read_text())) if self.instant_file.exists() else set()
+            self.mtimes = tuple(_mtime(path) for path in self._files())
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        self.region_users = {}
+        self.with_regions = set()
+        for uid, selected in self.user_regions.items():
+            if selected:
+                self.with_regions.add(int(uid))
+            for region in selected:
+                self.region_users.setdefault(region, set()).add(int(uid))
+
+    def reload_if_changed(self):
+        with self.lock:
+            if self._dirty:
+                return
+            if tuple(_mtime(path) for path in self._files()) != self.mtimes:
+                logger.info("[SUBSCRIPTIONS] Файлы подписок изменились — перечитываем")
+                self.load()
+
+    # === Чтение ===
+    def is_subscribed(self, user_id: int) -> bool:
+        return user_id in self.user_set
+
+    def get_users(self) -> list[int]:
+        with self.lock:
+            return list(self.users)
+
+    def get_regions(self, user_id: int) -> list[str]:
+        with self.lock:
+            return list(self.user_regions.get(str(user_id), []))
+
+    def is_instant(self, user_id: int) -> bool:
+        return user_id in self.instant
+
+    def recipients_for_region(self, region: str, extra=(), instant_only: bool = False) -> set[int]:
+        """
+        Подписчики (и extra, например админы), которым нужен алерт по региону:
+        выбравшие этот регион или не выбравшие ни одного.
+        instant_only — только включившие срочные оповещения.
+        """
+        with self.lock:
+            candidates = self.user_set | set(extra)
+            if instant_only:
+                candidates &= self.instant
+            return (candidates & self.region_users.get(region, set())) | (candidates - self.with_regions)
+
+    # === Запись ===
+    def add_user(self, user_id: int):
+        with self.lock:
+            if user_id not in self.user_set:
+                self.users.append(user_id)
+                self.user_set.add(user_id)
+                self.dirty_users = True
+                self._schedule_flush()
+
+    def remove_user(self, user_id: int):
+        with self.lock:
+            if user_id in self.user_set:
+                self.users.remove(user_id)
+                self.user_set.discard(user_id)
+                self.dirty_users = True
+            if str(user_id) in self.user_regions:
+                del self.user_regions[str(user_id)]
+                self._rebuild_index()
+                self.dirty_regions = True
+            if user_id in self.instant:
+                self.instant.discard(user_id)
+                self.dirty_instant = True
+            self._schedule_flush()
+
+    def set_instant(self, user_id: int, enabled: bool):
+        with self.lock:
+            if enabled != (user_id in self.instant):
+                (self.instant.add if enabled else self.instant.discard)(user_id)
+                self.dirty_instant = True
+                self._schedule_flush()
+
+    def set_regions(self, user_id: int, regions: list[str]):
+        with self.lock:
+            self.user_regions[str(user_id)] = list(regions)
+            self._rebuild_index()
+            self.dirty_regions = True
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.timer is None and self._dirty:
+            self.timer = threading.Timer(FLUSH_DELAY, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            try:
+                if self.dirty_users:
+                    atomic_write_text(self.users_file, json.dumps(self.users))
+                    self.dirty_users = False
+                if self.dirty_regions:
+                    atomic_write_text(self.regions_file, json.dumps(self.user_regions, ensure_ascii=False, indent=2))
+                    self.dirty_regions = False
+                if self.dirty_instant:
+                    atomic_write_text(self.instant_file, json.dumps(sorted(self.instant)))
+                    self.dirty_instant = False
+            except OSError as e:
+                logger.error(f"[SUBSCRIPTIONS] Ошибка сохранения подписок: {e}")
+            self.mtimes = tuple(_mtime(path) for path in self._files())
+
+
+_store = None
+
+
+def get_store() -> SubscriptionStore:
+    """
+    Общее хранилище подписок процесса.
+    """
+    global _store
+    if _store is None:
+        _store = SubscriptionStore()
+        atexit.register(_store.flush)
+    else:
+        _store.reload_if_changed()
+    return _store
@@ -0,0 +1,46 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def atomic_write_bytes(path: Path, content: bytes):
+    """
+    Пишет файл через временный файл и os.replace: читатели видят либо старую, либо новую версию.
+    Имя временного файла уникально для процесса и потока — параллельные записи не мешают друг другу.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def atomic_write_text(path: Path, text: str):
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def atomic_write_json(path: Path, data, indent=2):
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+
+@contextmanager
+def exclusive_lock(path: Path):
+    """
+    Межпроцессная блокировка через flock без ожидания: внутри блока — True, если блокировка
+    получена, False, если её держит другой процесс. Снимается при выходе или смерти процесса.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,110 @@
+from itertools import product
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000
+
+
+def local_xy(lat, lon):
+    """
+    Координаты в метрах (равнопромежуточная проекция с масштабом по широте точки):
+    на расстояниях в несколько километров ошибка — доли процента.
+    """
+    lat_rad = np.radians(np.asarray(lat, dtype="float64"))
+    lon_rad = np.radians(np.asarray(lon, dtype="float64"))
+    return EARTH_RADIUS_M * lon_rad * np.cos(lat_rad), EARTH_RADIUS_M * lat_rad
+
+
+def _half_neighbourhood(dims: int):
+    # Своя ячейка и «верхняя» половина соседей — каждая пара ячеек просматривается один раз
+    zero = (0,) * dims
+    return [zero] + [offset for offset in product((-1, 0, 1), repeat=dims) if offset > zero]
+
+
+def grid_pairs(x, y, radius, groups=None, t=None, window=None):
+    """
+    Пары точек (i, j), чьи круги радиуса radius пересекаются (расстояние ≤ r_i + r_j),
+    через пространственный хэш: сравниваются только точки соседних ячеек, поэтому время
+    растёт линейно при ограниченной плотности точек.
+
+    radius — число или массив радиусов точек (в метрах, как x/y);
+    groups — метки, пары ищутся только внутри группы;
+    t, window — время точек и окно: пары только при |t_i - t_j| ≤ window.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n = len(x)
+    empty = np.empty(0, dtype="int64")
+    if n == 0:
+        return empty, empty
+
+    radius = np.broadcast_to(np.asarray(radius, dtype="float64"), (n,))
+    cell = 2 * float(radius.max())
+    coords = [np.floor(x / cell).astype("int64"), np.floor(y / cell).astype("int64")]
+    if t is not None:
+        t = np.asarray(t, dtype="float64")
+        coords.append(np.floor(t / window).astype("int64"))
+    if groups is not None:
+        # Группа — ещё одна ось ячейки, по которой смещения не делаются
+        coords.append(np.unique(np.asarray(groups), return_inverse=True)[1].astype("int64"))
+
+    # Ячейка кодируется одним int64 (смешанная система счисления с запасом на смещение ±1)
+    lows = [c.min() - 1 for c in coords]
+    spans = [int(c.max() - low) + 2 for c, low in zip(coords, lows)]
+
+    keys = np.zeros(n, dtype="int64")
+    places = []
+    for c, low, span in zip(coords, lows, spans):
+        keys = keys * span + (c - low)
+        places = [place * span for place in places] + [1]
+    order = np.argsort(keys, kind="stable")
+    # Занятые ячейки: ключ, начало диапазона в order и число точек
+    cells, starts, sizes = np.unique(keys[order], return_index=True, return_counts=True)
+    cell_of_point = np.repeat(np.arange(len(cells)), sizes)
+
+    left, right = [], []
+    spatial_dims = len(coords) - (groups is not None)
+    for offset in _half_neighbourhood(spatial_dims):
+        # Соседняя ячейка — сдвиг ключа на константу: поиск идёт по занятым ячейкам,
+        # отсортированными запросами, а не по каждой точке
+        neighbour = cells + sum(o * place for o, place in zip(offset, places))
+        found = np.minimum(np.searchsorted(cells, neighbour), len(cells) - 1)
+        hit = cells[found] == neighbour
+        lo = np.where(hit, starts[found], 0)[cell_of_point]
+        count = np.where(hit, sizes[found], 0)[cell_of_point]
+        ii = np.repeat(order, count)
+        # Позиции внутри диапазона [lo, lo + count) каждой точки
+        within = np.arange(len(ii)) - np.repeat(np.cumsum(count) - count, count)
+        jj = order[np.repeat(lo, count) + within]
+        close = (x[ii] - x[jj]) ** 2 + (y[ii] - y[jj]) ** 2 <= (radius[ii] + radius[jj]) ** 2
+        if t is not None:
+            close &= np.abs(t[ii] - t[jj]) <= window
+        if not any(offset):
+            close &= ii < jj
+        left.append(ii[close])
+        right.append(jj[close])
+
+    return np.concatenate(left), np.concatenate(right)
+
+
+def connected_components(n: int, left, right) -> np.ndarray:
+    """
+    Метки компонент связности графа из n вершин с рёбрами (left[k], right[k]) — union-find.
+    Метка компоненты — наименьший индекс вершины в ней.
+    """
+    parent = list(range(n))
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    for i, j in zip(np.asarray(left).tolist(), np.asarray(right).tolist()):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    return np.array([find(i) for i in range(n)], dtype="int64")
@@ -0,0 +1,282 @@
+# utils/metrics.py
+#
+# Метрики запуска пайплайна: время, строки на входе/выходе и пик памяти по этапам,
+# гистограммы задержек HTTP и произвольные показатели (например, сообщений/с).
+# Итог пишется JSON-отчётом и, по желанию, текстовым файлом для node_exporter (Prometheus).
+
+import logging
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from utils.files import atomic_write_json, atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+REPORTS_DIR = Path("data/reports")
+LAST_REPORT_FILE = REPORTS_DIR / "last_run.json"
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+PROMETHEUS_PREFIX = "geo_monitoring"
+
+
+# === Память процесса ===
+def _read_status_kb(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_bytes() -> int:
+    """
+    Пик RSS с последнего сброса (VmHWM); вне Linux — пик за всё время процесса.
+    """
+    kb = _read_status_kb("VmHWM")
+    if kb is None:
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb * 1024
+
+
+def reset_peak_rss():
+    # Сброс VmHWM до текущего RSS (Linux ≥ 4.0); без прав или вне Linux — пик за весь процесс
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+# === Показатели ===
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Оценка квантиля по верхним границам корзин.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {str(b): n for b, n in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+class StageRecord:
+    def __init__(self, name: str, rows_in: int | None = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall = 0.0
+        self.peak_rss = 0
+        self.extra = {}
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "wall_s": round(self.wall, 4),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_rss_mb": round(self.peak_rss / 2 ** 20, 1),
+            **self.extra,
+        }
+
+
+class RunMetrics:
+    """
+    Метрики одного запуска. Этапы могут быть вложенными: пик памяти вложенного
+    этапа учитывается и во внешнем.
+    """
+
+    def __init__(self, run_id: str | None = None):
+        self.run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.stages = []
+        self.histograms = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> list:
+        # Стек вложенных этапов — свой у каждого потока (анализ в бот-процессе идёт в пуле)
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None):
+        """
+        with metrics.stage("match", rows_in=len(gdf)) as st: ...; st.rows_out = len(result)
+        """
+        record = StageRecord(name, rows_in)
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak_rss = max(parent.peak_rss, peak_rss_bytes())
+        reset_peak_rss()
+        self._stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - started
+            record.peak_rss = max(record.peak_rss, peak_rss_bytes())
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1].peak_rss = max(self._stack[-1].peak_rss, record.peak_rss)
+            self.stages.append(record)
+            logger.info(f"[METRICS] {name}: {record.wall:.2f} с, строк {record.rows_in} → {record.rows_out}, "
+                        f"пик памяти {record.peak_rss / 2 ** 20:.0f} МБ")
+
+    def observe(self, name: str, seconds: float):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    def gauge(self, name: str, value: float):
+        with self.lock:
+            self.gauges[name] = value
+
+    # === Вывод ===
+    def as_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_s": round(time.perf_counter() - self.started, 4),
+            "peak_rss_mb": round(max([s.peak_rss for s in self.stages] or [peak_rss_bytes()]) / 2 ** 20, 1),
+            "stages": [s.as_dict() for s in self.stages],
+            "http": {name: h.as_dict() for name, h in sorted(self.histograms.items())},
+            "gauges": dict(sorted(self.gauges.items())),
+        }
+
+    def write_report(self, path: Path | None = None) -> Path:
+        """
+        JSON-отчёт запуска: data/reports/run-<run_id>.json и копия в last_run.json.
+        """
+        report = self.as_dict()
+        path = Path(path) if path else REPORTS_DIR / f"run-{self.run_id}.json"
+        atomic_write_json(path, report)
+        atomic_write_json(LAST_REPORT_FILE, report)
+        logger.info(f"[METRICS] Отчёт запуска сохранён в {path}")
+        return path
+
+    def to_prometheus(self) -> str:
+        p = PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{p}_{name}{{{label_text}}} {value}" if label_text else f"{p}_{name} {value}")
+
+        # Повторяющиеся этапы (например, несколько рассылок) суммируются; пик памяти — максимум
+        totals = {}
+        for s in self.stages:
+            t = totals.setdefault(s.name, {"wall": 0.0, "rows_in": None, "rows_out": None, "peak": 0})
+            t["wall"] += s.wall
+            t["peak"] = max(t["peak"], s.peak_rss)
+            for field in ("rows_in", "rows_out"):
+                value = getattr(s, field)
+                if value is not None:
+                    t[field] = (t[field] or 0) + value
+
+        def samples(field):
+            return [({"stage": n}, round(t[field], 4)) for n, t in totals.items() if t[field] is not None]
+
+        metric("stage_duration_seconds", "gauge", "Время этапа последнего запуска", samples("wall"))
+        metric("stage_rows_in", "gauge", "Строк на входе этапа", samples("rows_in"))
+        metric("stage_rows_out", "gauge", "Строк на выходе этапа", samples("rows_out"))
+        metric("stage_peak_rss_bytes", "gauge", "Пик RSS процесса во время этапа", samples("peak"))
+
+        if self.histograms:
+            lines.append(f"# HELP {p}_http_request_duration_seconds Задержка HTTP-запросов")
+            lines.append(f"# TYPE {p}_http_request_duration_seconds histogram")
+        for name, h in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, n in zip(h.buckets + ("+Inf",), h.counts):
+                cumulative += n
+                lines.append(f'{p}_http_request_duration_seconds_bucket{{client="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_http_request_duration_seconds_sum{{client="{name}"}} {h.sum:.4f}')
+            lines.append(f'{p}_http_request_duration_seconds_count{{client="{name}"}} {h.count}')
+
+        for name, value in sorted(self.gauges.items()):
+            metric(name, "gauge", name, [({}, value)])
+
+        metric("last_run_timestamp_seconds", "gauge", "Время начала последнего запуска",
+               [({}, int(self.started_at.timestamp()))])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Текстовый файл для textfile collector node_exporter; пишется атомарно.
+        """
+        atomic_write_text(Path(path), self.to_prometheus())
+        logger.info(f"[METRICS] Метрики Prometheus записаны в {path}")
+
+
+_current = RunMetrics()
+
+
+def start_run(run_id: str | None = None) -> RunMetrics:
+    """
+    Начинает сбор метрик нового запуска.
+    """
+    global _current
+    _current = RunMetrics(run_id)
+    return _current
+
+
+def get_metrics() -> RunMetrics:
+    return _current
+
+
+def stage(name: str, rows_in: int | None = None):
+    return _current.stage(name, rows_in)
+
+
+def observe(name: str, seconds: float):
+    _current.observe(name, seconds)
+
+
+def gauge(name: str, value: float):
+    _current.gauge(name, value)
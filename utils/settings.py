@@ -0,0 +1,151 @@
+# utils/settings.py
+#
+# Настройки из data/settings.json: регионы и их включение, погрешности источников,
+# порог и ключи критичных торфяников. Файл перечитывается при изменении mtime —
+# правка вступает в силу без перезапуска бота. Производные поля (включённые регионы,
+# погрешности по источнику) считаются один раз при загрузке.
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_FILE = Path("data/settings.json")
+
+DEFAULT_REGIONS = [
+    "Владимирская область", "Ивановская область", "Калужская область",
+    "Костромская область", "Московская область", "Рязанская область",
+    "Смоленская область", "Тверская область", "Ярославская область",
+]
+
+# Погрешности по источнику в метрах (EPSG:3857)
+DEFAULT_SOURCE_TOLERANCE = {
+    "modis": 1000,
+    "viirs_suomi": 300,
+    "viirs_noaa20": 375,
+    "viirs_noaa21": 375,
+}
+DEFAULT_TOLERANCE = 500
+
+DEFAULT_ALERT_THRESHOLD = 3
+
+# Фильтр качества термоточек перед сопоставлением (core/detection_filter.py):
+# MODIS — числовая достоверность 0–100, VIIRS — уровни l/n/h
+DEFAULT_DETECTION_FILTER = {
+    "enabled": True,
+    "modis_min_confidence": 30,
+    "viirs_confidence": ["n", "h"],
+    "min_frp": 0,
+}
+
+# Слияние детекций разных сенсоров одного пожара (core/sensor_dedup.py)
+DEFAULT_SENSOR_DEDUP = {
+    "enabled": True,
+    "window_minutes": 30,
+}
+
+# Регион торфяника на границе записан как "Тверская область/Московская область"
+REGION_SEPARATOR = "/"
+
+
+class Settings:
+    """
+    Неизменяемый снимок настроек. Регион, не упомянутый в regions_enabled, включён;
+    выключает только явное false.
+    """
+
+    def __init__(self, raw: dict | None = None):
+        raw = raw or {}
+        self.alert_threshold: int = int(raw.get("alert_threshold", DEFAULT_ALERT_THRESHOLD))
+        self.critical_keys: frozenset[str] = frozenset(str(key) for key in raw.get("critical_keys", []))
+        self.regions_enabled: dict[str, bool] = {
+            str(region): bool(enabled) for region, enabled in raw.get("regions_enabled", {}).items()
+        }
+        self.disabled_regions: frozenset[str] = frozenset(
+            region for region, enabled in self.regions_enabled.items() if not enabled
+        )
+        self.regions: list[str] = [str(region) for region in raw.get("regions", DEFAULT_REGIONS)]
+        # Регионы, доступные подписчикам для выбора
+        self.enabled_regions: list[str] = [r for r in self.regions if r not in self.disabled_regions]
+        self.source_tolerance: dict[str, int] = {
+            **DEFAULT_SOURCE_TOLERANCE,
+            **{str(source): int(value) for source, value in raw.get("source_tolerance", {}).items()},
+        }
+        self.default_tolerance: int = int(raw.get("default_tolerance", DEFAULT_TOLERANCE))
+        detection_filter = {**DEFAULT_DETECTION_FILTER, **raw.get("detection_filter", {})}
+        self.filter_enabled: bool = bool(detection_filter["enabled"])
+        self.modis_min_confidence: float = float(detection_filter["modis_min_confidence"])
+        self.viirs_confidence: frozenset[str] = frozenset(
+            str(level).strip().lower()[:1] for level in detection_filter["viirs_confidence"]
+        )
+        self.min_frp: float = float(detection_filter["min_frp"])
+        sensor_dedup = {**DEFAULT_SENSOR_DEDUP, **raw.get("sensor_dedup", {})}
+        self.dedup_enabled: bool = bool(sensor_dedup["enabled"])
+        self.dedup_window_seconds: float = float(sensor_dedup["window_minutes"]) * 60
+
+    def tolerance(self, source: str) -> int:
+        base_name = source.replace("_archive", "")  # удаляем _archive, если есть
+        return self.source_tolerance.get(base_name, self.default_tolerance)
+
+    def is_region_enabled(self, region: str) -> bool:
+        """
+        Торфяник на границе регионов учитывается, пока включён хотя бы один из них.
+        """
+        if not self.disabled_regions:
+            return True
+        return any(part.strip() not in self.disabled_regions for part in str(region).split(REGION_SEPARATOR))
+
+
+class SettingsService:
+    """
+    Текущие настройки процесса. get() сверяет mtime файла (один stat) и перечитывает
+    его при изменении; файл с ошибкой не применяется — остаются прежние настройки.
+    """
+
+    def __init__(self, path: Path = SETTINGS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = None
+        self.settings = Settings()
+        self.reload()
+
+    def _state(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def reload(self):
+        with self.lock:
+            state = self._state()
+            if state == self.state:
+                return
+            try:
+                raw = json.loads(self.path.read_text(encoding="utf-8")) if state else {}
+                self.settings = Settings(raw)
+                logger.info(f"[SETTINGS] Загружены настройки из {self.path}")
+            except Exception as e:
+                logger.error(f"[SETTINGS] Ошибка в {self.path}: {e} — остаются прежние настройки")
+            self.state = state
+
+    def get(self) -> Settings:
+        if self._state() != self.state:
+            self.reload()
+        return self.settings
+
+
+_service = None
+
+
+def get_settings() -> Settings:
+    """
+    Актуальные настройки: изменения data/settings.json подхватываются без перезапуска.
+    """
+    global _service
+    if _service is None:
+        _service = SettingsService()
+    return _service.get()
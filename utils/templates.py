@@ -0,0 +1,89 @@
+# utils/templates.py
+#
+# Шаблоны сообщений из каталога templates/: читаются и компилируются один раз,
+# плейсхолдеры проверяются по схеме данных при загрузке (опечатка в шаблоне — ошибка
+# запуска, а не сбой каждого сообщения), строковые значения экранируются для HTML.
+
+import html
+from pathlib import Path
+from string import Formatter
+
+# Шаблоны — часть кода, а не данных: путь не зависит от рабочего каталога
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def _escape(value):
+    # Числа остаются числами — к ним применяется формат из шаблона ({lat:.5f})
+    if isinstance(value, (int, float)):
+        return value
+    return html.escape(str(value))
+
+
+class Template:
+    """
+    Скомпилированный шаблон: поля переписаны в позиционные ({title} → {0}), поэтому
+    рендер — один вызов str.format без разбора шаблона и словаря аргументов.
+    """
+
+    def __init__(self, name: str, text: str, fields, escape_html: bool = True):
+        self.name = name
+        self.text = text
+        self.escape_html = escape_html
+        self.fields = []
+        parts = []
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError as e:
+            raise TemplateError(f"Шаблон {name}: {e}") from None
+        for literal, field, spec, conversion in parsed:
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if not field or field.isdigit() or not field.isidentifier():
+                raise TemplateError(f"Шаблон {name}: поддерживаются только именованные поля, а не {{{field}}}")
+            if field not in fields:
+                raise TemplateError(f"Шаблон {name}: поле {{{field}}} отсутствует в схеме ({', '.join(sorted(fields))})")
+            if field not in self.fields:
+                self.fields.append(field)
+            position = self.fields.index(field)
+            parts.append("{" + str(position) + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+        self.compiled = "".join(parts)
+
+    def _values(self, values: dict) -> list:
+        if self.escape_html:
+            return [_escape(values[field]) for field in self.fields]
+        return [values[field] for field in self.fields]
+
+    def render(self, values: dict) -> str:
+        return self.compiled.format(*self._values(values))
+
+    def render_many(self, items) -> list[str]:
+        """
+        Тексты для всей рассылки одним проходом.
+        """
+        compiled, values = self.compiled, self._values
+        return [compiled.format(*values(item)) for item in items]
+
+
+_loaded = {}
+
+
+def load_template(name: str, fields, escape_html: bool = True, directory: Path = TEMPLATES_DIR) -> Template:
+    """
+    Шаблон templates/<name>.txt, проверенный по схеме fields; читается один раз на процесс.
+    Схема и escape_html входят в ключ кэша: другой вызывающий со своей схемой получает
+    шаблон, проверенный по ней, а не чужой скомпилированный объект.
+    """
+    fields = frozenset(fields)
+    key = (Path(directory), name, fields, escape_html)
+    if key not in _loaded:
+        path = Path(directory) / f"{name}.txt"
+        text = path.read_text(encoding="utf-8").rstrip("\n")
+        if not text:
+            raise TemplateError(f"Шаблон {path} пуст")
+        _loaded[key] = Template(name, text, fields, escape_html)
+    return _loaded[key]